@@ -11,23 +11,44 @@ Outputs under docs/python/aa_split_outputs:
 - aa_text_to_video_raw.csv                   (if endpoint available)
 - aa_image_to_video_raw.csv                  (if endpoint available)
 - aa_fetch_summary.json
+
+Raw HTTP responses are cached under docs/python/.cache/http (gzip) and
+revalidated with ETag/Last-Modified. Environment knobs:
+- AA_HTTP_CACHE=0            disable the cache
+- AA_HTTP_CACHE_TTL=<secs>   serve cached responses younger than this without a request
+- AA_HTTP_CACHE_DIR=<path>   cache location
+
+OpenRouter aliases come from the shared index in scripts/alias_index.py
+(cached under .cache/alias_index, rebuilt when the OR payload changes).
 """
 
 import datetime as dt
+import gzip
+import hashlib
 import json
 import os
-import re
+import sys
+import time
 from pathlib import Path
 
 import pandas as pd
 import requests
 from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
 from urllib3.util.retry import Retry
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "scripts"))
+from aa_categories import pivot_categories  # noqa: E402
+from alias_index import load_alias_index, lookup_aliases_many  # noqa: E402
+
 AA_API_BASE_URL = "https://artificialanalysis.ai/api/v2/data"
 OPENROUTER_API_URL = "https://openrouter.ai/api/v1/models"
 DEFAULT_AA_KEY = "aa_UVcVfuiZkbPQIaQxPZkvaMiIgkihaWzF"
 REQUEST_TIMEOUT = 30
+HTTP_CACHE_ENABLED = os.getenv("AA_HTTP_CACHE", "1").strip().lower() not in {"0", "false", "no", "off"}
+HTTP_CACHE_TTL = float(os.getenv("AA_HTTP_CACHE_TTL", "0") or 0)
+HTTP_CACHE_DIR = Path(os.getenv("AA_HTTP_CACHE_DIR") or Path(__file__).resolve().parent / ".cache" / "http")
 
 ENDPOINTS = {
     "llm_models": "llms/models",
@@ -73,6 +94,19 @@ MEDIA_ADV_COLUMNS_TEXT_TO_IMAGE = [
     "category_subject_commercial_elo",
 ]
 
+# Style columns named differently across endpoints: output column -> candidates in priority order.
+MEDIA_STYLE_COALESCE_VIDEO = {
+    "category_style_photorealistic_elo": [
+        "category_style_photorealistic_elo",
+        "category_style_general_photorealistic_elo",
+    ],
+    "category_style_cartoon_and_anime_elo": [
+        "category_style_cartoon_and_anime_elo",
+        "category_style_cartoon_illustration_elo",
+        "category_style_anime_elo",
+    ],
+}
+
 CN_PROVIDERS = {
     "deepseek", "alibaba", "baidu", "bytedance", "zhipu",
     "moonshot", "minimax", "tencent", "01ai", "kimi", "z ai", "xiaomi",
@@ -99,6 +133,94 @@ CN_NAME_MAP = {
 }
 
 
+class CachingHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter with an on-disk, gzip-compressed cache for successful GETs.
+
+    Entries are keyed by the full request URL (query params included). An
+    entry younger than `ttl` seconds is served without touching the network;
+    older entries are revalidated with If-None-Match / If-Modified-Since when
+    the upstream sent ETag / Last-Modified, and reused on 304.
+    """
+
+    def __init__(self, cache_dir: Path, ttl: float = 0, **kwargs):
+        super().__init__(**kwargs)
+        self.cache_dir = Path(cache_dir)
+        self.ttl = ttl
+
+    def _paths(self, url: str) -> tuple[Path, Path]:
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return self.cache_dir / f"{key}.json", self.cache_dir / f"{key}.body.gz"
+
+    def _load(self, url: str):
+        meta_path, body_path = self._paths(url)
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            with gzip.open(body_path, "rb") as f:
+                body = f.read()
+        except (OSError, ValueError):
+            return None
+        return meta, body
+
+    def _store(self, url: str, meta: dict, body: bytes | None = None) -> None:
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        meta_path, body_path = self._paths(url)
+        if body is not None:
+            tmp_body = body_path.with_suffix(".tmp")
+            with gzip.open(tmp_body, "wb") as f:
+                f.write(body)
+            os.replace(tmp_body, body_path)
+        tmp_meta = meta_path.with_suffix(".tmp")
+        tmp_meta.write_text(json.dumps(meta), encoding="utf-8")
+        os.replace(tmp_meta, meta_path)
+
+    @staticmethod
+    def _cached_response(request, meta: dict, body: bytes, status: str) -> requests.Response:
+        resp = requests.Response()
+        resp.status_code = 200
+        resp.reason = "OK"
+        resp.headers = CaseInsensitiveDict(meta.get("headers") or {})
+        resp.headers["X-Local-Cache"] = status
+        resp._content = body
+        resp.encoding = get_encoding_from_headers(resp.headers)
+        resp.url = request.url
+        resp.request = request
+        return resp
+
+    def send(self, request, **kwargs):
+        if request.method != "GET":
+            return super().send(request, **kwargs)
+
+        cached = self._load(request.url)
+        if cached:
+            meta, body = cached
+            if self.ttl > 0 and time.time() - meta.get("stored_at", 0) < self.ttl:
+                return self._cached_response(request, meta, body, "fresh")
+            if meta.get("etag"):
+                request.headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                request.headers["If-Modified-Since"] = meta["last_modified"]
+
+        resp = super().send(request, **kwargs)
+        if resp.status_code == 304 and cached:
+            meta["stored_at"] = time.time()
+            self._store(request.url, meta)
+            return self._cached_response(request, meta, body, "revalidated")
+        if resp.status_code == 200:
+            self._store(
+                request.url,
+                {
+                    "url": request.url,
+                    "stored_at": time.time(),
+                    "etag": resp.headers.get("ETag"),
+                    "last_modified": resp.headers.get("Last-Modified"),
+                    "headers": {"Content-Type": resp.headers.get("Content-Type", "application/json")},
+                },
+                resp.content,
+            )
+            resp.headers["X-Local-Cache"] = "miss"
+        return resp
+
+
 def build_session() -> requests.Session:
     session = requests.Session()
     retry = Retry(
@@ -109,8 +231,12 @@ def build_session() -> requests.Session:
         status_forcelist=(429, 500, 502, 503, 504),
         allowed_methods=("GET",),
     )
-    session.mount("https://", HTTPAdapter(max_retries=retry))
-    session.mount("http://", HTTPAdapter(max_retries=retry))
+    if HTTP_CACHE_ENABLED:
+        adapter = CachingHTTPAdapter(HTTP_CACHE_DIR, ttl=HTTP_CACHE_TTL, max_retries=retry)
+    else:
+        adapter = HTTPAdapter(max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
     return session
 
 
@@ -120,54 +246,6 @@ def safe_json(value):
     return value
 
 
-def normalize_name(name):
-    if not isinstance(name, str):
-        return ""
-    text = name.lower().strip()
-    text = text.replace("gpt-4o", "gpt4o").replace("gpt-4-omni", "gpt4o")
-    text = re.sub(r"[\s_]+", "-", text)
-    text = re.sub(r"[^a-z0-9\-/]", "", text)
-    return text.strip("-/")
-
-
-def strip_provider_prefix(text):
-    if not isinstance(text, str):
-        return ""
-    return re.sub(r"^[^:]{1,40}:\s*", "", text).strip()
-
-
-def remove_date_noise(text):
-    if not isinstance(text, str):
-        return ""
-    t = text.lower()
-    t = re.sub(r"\([^)]*\)", " ", t)
-    t = re.sub(r"\b(19|20)\d{2}\b", " ", t)
-    t = re.sub(r"\b\d{8}\b|\b\d{6}\b|\b\d{4}\b", " ", t)
-    t = re.sub(r"\b(?:jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)[a-z]*[-\s']?\d{2,4}\b", " ", t)
-    t = re.sub(r"\b(?:preview|latest|stable|release|experimental|exp)\b", " ", t)
-    return re.sub(r"\s+", " ", t).strip()
-
-
-def model_core_key(value):
-    if not isinstance(value, str):
-        return ""
-    text = strip_provider_prefix(value)
-    text = remove_date_noise(text)
-    text = normalize_name(text)
-    text = re.sub(r"(?:[-_/](?:free|beta|alpha|chat|instruct|latest))+$", "", text)
-    return re.sub(r"-{2,}", "-", text).strip("-/")
-
-
-def make_aliases(slug: str, name: str, canonical: str = "") -> set[str]:
-    candidates = [slug, name, strip_provider_prefix(name), canonical]
-    aliases = set()
-    for c in candidates:
-        aliases.add(normalize_name(c))
-        aliases.add(model_core_key(c))
-    aliases.discard("")
-    return aliases
-
-
 def fetch_endpoint(session: requests.Session, aa_key: str, endpoint: str):
     url = f"{AA_API_BASE_URL}/{endpoint}"
     headers = {"x-api-key": aa_key}
@@ -181,6 +259,7 @@ def fetch_endpoint(session: requests.Session, aa_key: str, endpoint: str):
     try:
         resp = session.get(url, headers=headers, params=params, timeout=REQUEST_TIMEOUT)
         resp.raise_for_status()
+        print(f"{endpoint}: cache {resp.headers.get('X-Local-Cache', 'off')}")
         payload = resp.json().get("data", [])
         return payload, None
     except Exception as e:
@@ -191,6 +270,7 @@ def fetch_openrouter_models(session: requests.Session):
     try:
         resp = session.get(OPENROUTER_API_URL, timeout=REQUEST_TIMEOUT)
         resp.raise_for_status()
+        print(f"openrouter models: cache {resp.headers.get('X-Local-Cache', 'off')}")
         return resp.json().get("data", []), None
     except Exception as e:
         return [], str(e)
@@ -221,29 +301,15 @@ def infer_reasoning_type(name: str) -> str:
 
 
 def build_or_context_map(or_records):
-    or_index = {}
-    for rec in or_records:
-        model_id = rec.get("id") or ""
-        model_name = rec.get("name") or ""
-        canonical = rec.get("canonical_slug") or ""
-        aliases = make_aliases(model_id, model_name, canonical)
-        context_length = rec.get("context_length")
-        for alias in aliases:
-            if alias not in or_index:
-                or_index[alias] = context_length
-    return or_index
-
-
-def match_context_length(aa_slug: str, aa_name: str, or_index: dict):
-    aliases = list(make_aliases(aa_slug, aa_name))
-    # Prefer exact normalized slug alias, then fallback to other aliases.
-    primary = normalize_name(aa_slug)
-    if primary in or_index:
-        return or_index.get(primary)
-    for alias in aliases:
-        if alias in or_index:
-            return or_index.get(alias)
-    return None
+    # Shared with scripts/pipeline.py; persisted per OR payload hash.
+    return load_alias_index(or_records)
+
+
+def match_context_lengths(records, or_index: dict):
+    # Normalize the whole column once, then look every record up in the alias index.
+    slugs = [rec.get("slug") or "" for rec in records]
+    names = [rec.get("name") or "" for rec in records]
+    return [entry["context_length"] if entry else None for entry in lookup_aliases_many(or_index, slugs, names)]
 
 
 def build_llm_processed(records, or_context_map):
@@ -251,7 +317,8 @@ def build_llm_processed(records, or_context_map):
     today = dt.date.today().isoformat()
     now_utc = dt.datetime.now(dt.timezone.utc).isoformat()
 
-    for rec in records:
+    context_lengths = match_context_lengths(records, or_context_map)
+    for rec, context_length in zip(records, context_lengths):
         evals = rec.get("evaluations") or {}
         pricing = rec.get("pricing") or {}
         creator = rec.get("model_creator") or {}
@@ -281,11 +348,7 @@ def build_llm_processed(records, or_context_map):
                 "aa_price_input_usd": pricing.get("price_1m_input_tokens"),
                 "aa_price_output_usd": pricing.get("price_1m_output_tokens"),
                 "aa_price_blended_usd": pricing.get("price_1m_blended_3_to_1"),
-                "aa_context_length": match_context_length(
-                    rec.get("slug") or "",
-                    rec.get("name") or "",
-                    or_context_map,
-                ),
+                "aa_context_length": context_length,
                 "aa_release_date": rec.get("release_date") or "",
                 "has_aa": "true",
                 "record_date": today,
@@ -299,50 +362,16 @@ def build_llm_processed(records, or_context_map):
     return df
 
 
-def slugify_text(value: str) -> str:
-    text = (value or "").strip().lower()
-    text = re.sub(r"\s+", "_", text)
-    text = re.sub(r"[^a-z0-9_]+", "_", text)
-    text = re.sub(r"_+", "_", text).strip("_")
-    return text or "unknown"
-
-
-def category_label(item: dict) -> str:
-    style = (item.get("style_category") or "").strip()
-    subject = (item.get("subject_matter_category") or "").strip()
-    fmt = (item.get("format_category") or "").strip()
-    parts = []
-    if style:
-        parts.append(f"Style: {style}")
-    if subject:
-        parts.append(f"Subject: {subject}")
-    if fmt:
-        parts.append(f"Format: {fmt}")
-    if not parts:
-        parts.append("Category: Unspecified")
-    return " | ".join(parts)
-
-
-def parse_categories(value):
-    if isinstance(value, list):
-        return value
-    if isinstance(value, str):
-        text = value.strip()
-        if not text or text == "[]":
-            return []
-        try:
-            parsed = json.loads(text)
-            return parsed if isinstance(parsed, list) else []
-        except json.JSONDecodeError:
-            return []
-    return []
+def build_categories_wide_df(records, entries=None):
+    """One row per record with elo/ci95/appearances columns per category label.
 
-
-def build_categories_wide_df(records):
+    `entries` is the pivot_categories(records) long table, computed here when not given.
+    """
+    if entries is None:
+        entries = pivot_categories(records)
     base_rows = []
-    all_labels = set()
-    for rec in records:
-        categories = parse_categories(rec.get("categories"))
+    label_columns = {}
+    for rec, record_entries in zip(records, entries):
         row = {
             "id": rec.get("id"),
             "name": rec.get("name"),
@@ -355,13 +384,11 @@ def build_categories_wide_df(records):
             "ci95": rec.get("ci95"),
             "appearances": rec.get("appearances"),
         }
-        for item in categories:
-            label = category_label(item)
-            all_labels.add(label)
-            key_base = f"category_{slugify_text(label)}"
-            row[f"{key_base}_elo"] = item.get("elo")
-            row[f"{key_base}_ci95"] = item.get("ci95")
-            row[f"{key_base}_appearances"] = item.get("appearances")
+        for entry in record_entries:
+            label_columns[entry.label] = entry.column
+            row[f"{entry.column}_elo"] = entry.elo
+            row[f"{entry.column}_ci95"] = entry.ci95
+            row[f"{entry.column}_appearances"] = entry.appearances
         base_rows.append(row)
 
     if not base_rows:
@@ -369,8 +396,8 @@ def build_categories_wide_df(records):
 
     df = pd.DataFrame(base_rows)
     category_cols = []
-    for label in sorted(all_labels):
-        key_base = f"category_{slugify_text(label)}"
+    for label in sorted(label_columns):
+        key_base = label_columns[label]
         category_cols.extend(
             [
                 f"{key_base}_elo",
@@ -401,13 +428,22 @@ def drop_non_llm_unwanted_cols(df: pd.DataFrame) -> pd.DataFrame:
     return df.reindex(columns=keep_cols)
 
 
-def first_non_null(row: pd.Series, columns: list[str]):
+def coalesce_columns(df: pd.DataFrame, columns: list[str]) -> pd.Series:
+    """Per row, the first value in `columns` (priority order) that is neither null nor blank."""
+    result = pd.Series(None, index=df.index, dtype="object")
+    filled = pd.Series(False, index=df.index)
     for col in columns:
-        if col in row.index:
-            val = row[col]
-            if pd.notna(val) and str(val).strip() != "":
-                return val
-    return None
+        if col not in df.columns:
+            continue
+        values = df[col]
+        present = values.notna()
+        if not pd.api.types.is_numeric_dtype(values):
+            present &= values.astype(str).str.strip() != ""
+        take = present & ~filled
+        if take.any():
+            result = result.where(~take, values)
+            filled |= take
+    return result.infer_objects()
 
 
 def build_media_selected_df(wide_df: pd.DataFrame, endpoint_name: str) -> pd.DataFrame:
@@ -438,27 +474,8 @@ def build_media_selected_df(wide_df: pd.DataFrame, endpoint_name: str) -> pd.Dat
             out[col] = wide_df[col] if col in wide_df.columns else None
 
         # Normalize style naming differences across endpoints.
-        out["category_style_photorealistic_elo"] = wide_df.apply(
-            lambda r: first_non_null(
-                r,
-                [
-                    "category_style_photorealistic_elo",
-                    "category_style_general_photorealistic_elo",
-                ],
-            ),
-            axis=1,
-        )
-        out["category_style_cartoon_and_anime_elo"] = wide_df.apply(
-            lambda r: first_non_null(
-                r,
-                [
-                    "category_style_cartoon_and_anime_elo",
-                    "category_style_cartoon_illustration_elo",
-                    "category_style_anime_elo",
-                ],
-            ),
-            axis=1,
-        )
+        for col, candidates in MEDIA_STYLE_COALESCE_VIDEO.items():
+            out[col] = coalesce_columns(wide_df, candidates)
 
     return out.reindex(columns=MEDIA_BASE_COLUMNS + adv_cols)
 
@@ -502,11 +519,12 @@ def main():
         if name != "llm_models":
             raw_df = drop_non_llm_unwanted_cols(raw_df)
         raw_file = out_dir / f"aa_{name}_raw.csv"
-        if name in INCLUDE_CATEGORIES_ENDPOINTS:
+        # Pivot the categories once; both the raw and the wide outputs derive from it.
+        categories_wide_df = build_categories_wide_df(records) if name in INCLUDE_CATEGORIES_ENDPOINTS else None
+        if categories_wide_df is not None:
             # For these three categories, "raw" output is also constrained
             # to base + requested advanced fields.
-            wide_df_for_raw = build_categories_wide_df(records)
-            selected_df_for_raw = build_media_selected_df(wide_df_for_raw, name)
+            selected_df_for_raw = build_media_selected_df(categories_wide_df, name)
             selected_df_for_raw.to_csv(raw_file, index=False, encoding="utf-8")
             summary["outputs"][raw_file.name] = {
                 "rows": int(len(selected_df_for_raw)),
@@ -519,9 +537,8 @@ def main():
                 "cols": int(len(raw_df.columns)),
             }
 
-        if name in INCLUDE_CATEGORIES_ENDPOINTS:
-            wide_df = build_categories_wide_df(records)
-            wide_df = drop_non_llm_unwanted_cols(wide_df)
+        if categories_wide_df is not None:
+            wide_df = drop_non_llm_unwanted_cols(categories_wide_df)
             wide_df = build_media_selected_df(wide_df, name)
             wide_file = out_dir / f"aa_{name}_categories_wide.csv"
             wide_df.to_csv(wide_file, index=False, encoding="utf-8")
@@ -16,6 +16,10 @@ AA_API_BASE_URL = "https://artificialanalysis.ai/api/v2/data"
 OPENROUTER_API_URL = "https://openrouter.ai/api/v1/models"
 OUTPUT_CSV_FILE = "comprehensive_merged_data_v3.csv"
 REQUEST_TIMEOUT = 30
+# AA↔OR 一对一分配方式：greedy（按 AA 顺序贪心，默认）/ sorted（全局按分数排序贪心）/ optimal（分量内匈牙利算法）
+MATCH_ASSIGNMENT = os.getenv("MATCH_ASSIGNMENT", "greedy").strip().lower()
+# 单个连通分量较小一侧超过该规模时，optimal 退化为 sorted，避免 O(n^3)
+MAX_OPTIMAL_COMPONENT = 300
 
 # 可按需扩展端点。脚本会自动跳过失败端点，保证整体产出。
 AA_ENDPOINTS = [
@@ -68,19 +72,25 @@ def strip_provider_prefix(text):
     return re.sub(r"^[^:]{1,40}:\s*", "", text).strip()
 
 
+_DATE_NOISE_PATTERNS = (
+    # 去括号标注，如 "(Oct '24)" / "(May '25)"
+    r"\([^)]*\)",
+    # 去常见日期/发布尾巴
+    r"\b(19|20)\d{2}\b",
+    r"\b\d{8}\b",  # yyyymmdd
+    r"\b\d{6}\b",  # yymmdd
+    r"\b\d{4}\b",  # mmdd / yymm
+    r"\b(?:jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)[a-z]*[-\s']?\d{2,4}\b",
+    r"\b(?:preview|latest|stable|release|experimental|exp)\b",
+)
+
+
 def remove_date_and_release_noise(text):
     if not isinstance(text, str):
         return ""
     t = text.lower()
-    # 去括号标注，如 "(Oct '24)" / "(May '25)"
-    t = re.sub(r"\([^)]*\)", " ", t)
-    # 去常见日期/发布尾巴
-    t = re.sub(r"\b(19|20)\d{2}\b", " ", t)
-    t = re.sub(r"\b\d{8}\b", " ", t)  # yyyymmdd
-    t = re.sub(r"\b\d{6}\b", " ", t)  # yymmdd
-    t = re.sub(r"\b\d{4}\b", " ", t)  # mmdd / yymm
-    t = re.sub(r"\b(?:jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)[a-z]*[-\s']?\d{2,4}\b", " ", t)
-    t = re.sub(r"\b(?:preview|latest|stable|release|experimental|exp)\b", " ", t)
+    for pattern in _DATE_NOISE_PATTERNS:
+        t = re.sub(pattern, " ", t)
     t = re.sub(r"\s+", " ", t).strip()
     return t
 
@@ -97,6 +107,43 @@ def model_core_key(value):
     return text
 
 
+# ── 整列版本：与上面的逐值函数输出完全一致，用 pandas .str 向量化 ──────────────────
+
+def _text_series(values):
+    s = values if isinstance(values, pd.Series) else pd.Series(list(values), dtype="object")
+    return s.where(s.map(lambda v: isinstance(v, str)), "").astype("object")
+
+
+def normalize_name_series(values):
+    s = _text_series(values).str.lower().str.strip()
+    s = s.str.replace("gpt-4o", "gpt4o", regex=False).str.replace("gpt-4-omni", "gpt4o", regex=False)
+    s = s.str.replace("claude-3-opus-20240229", "claude-3-opus", regex=False)
+    s = s.str.replace("claude-3-sonnet-20240229", "claude-3-sonnet", regex=False)
+    s = s.str.replace("claude-3-haiku-20240307", "claude-3-haiku", regex=False)
+    s = s.str.replace(r"[\s_]+", "-", regex=True)
+    s = s.str.replace(r"[^a-z0-9\-/]", "", regex=True)
+    return s.str.strip("-/")
+
+
+def strip_provider_prefix_series(values):
+    return _text_series(values).str.replace(r"^[^:]{1,40}:\s*", "", regex=True).str.strip()
+
+
+def remove_date_and_release_noise_series(values):
+    s = _text_series(values).str.lower()
+    for pattern in _DATE_NOISE_PATTERNS:
+        s = s.str.replace(pattern, " ", regex=True)
+    return s.str.replace(r"\s+", " ", regex=True).str.strip()
+
+
+def model_core_key_series(values):
+    s = strip_provider_prefix_series(values)
+    s = remove_date_and_release_noise_series(s)
+    s = normalize_name_series(s)
+    s = s.str.replace(r"(?:[-_/](?:free|beta|alpha|chat|instruct|latest))+$", "", regex=True)
+    return s.str.replace(r"-{2,}", "-", regex=True).str.strip("-/")
+
+
 def split_tokens(key):
     if not isinstance(key, str) or key == "":
         return set()
@@ -164,35 +211,27 @@ def build_aa_df(raw_records):
         if required_col not in df.columns:
             df[required_col] = None
 
+    slug_norm = normalize_name_series(df["aa_slug"])
+    name_norm = normalize_name_series(df["aa_name"])
+    id_norm = normalize_name_series(df["aa_id"])
+    slug_core = model_core_key_series(df["aa_slug"])
+    name_core = model_core_key_series(df["aa_name"])
+    id_core = model_core_key_series(df["aa_id"])
+
     df["aa_primary_key"] = (
-        df["aa_slug"].map(normalize_name)
+        slug_norm
         .where(df["aa_slug"].notna(), "")
         .replace("", pd.NA)
-        .fillna(df["aa_name"].map(normalize_name))
+        .fillna(name_norm)
         .replace("", pd.NA)
-        .fillna(df["aa_id"].map(normalize_name))
+        .fillna(id_norm)
         .fillna("")
     )
-
-    def build_aliases(row):
-        slug = row.get("aa_slug")
-        name = row.get("aa_name")
-        model_id = row.get("aa_id")
-        aliases = {
-            normalize_name(slug),
-            normalize_name(name),
-            normalize_name(model_id),
-            model_core_key(slug),
-            model_core_key(name),
-            model_core_key(model_id),
-        }
-        aliases.discard("")
-        return sorted(aliases)
-
-    df["aa_aliases"] = df.apply(build_aliases, axis=1)
-    df["aa_core_key"] = (
-        df["aa_name"].apply(model_core_key).replace("", pd.NA).fillna(df["aa_slug"].apply(model_core_key)).fillna("")
-    )
+    df["aa_aliases"] = [
+        sorted(set(values) - {""})
+        for values in zip(slug_norm, name_norm, id_norm, slug_core, name_core, id_core)
+    ]
+    df["aa_core_key"] = name_core.replace("", pd.NA).fillna(slug_core).fillna("")
 
     grouped = (
         df.groupby("aa_primary_key", dropna=False, as_index=False)
@@ -214,43 +253,27 @@ def build_or_df(raw_records):
         if required_col not in df.columns:
             df[required_col] = None
 
-    def id_variants(or_id):
-        if not isinstance(or_id, str):
-            return []
-        parts = or_id.split("/")
-        variants = [or_id]
-        if len(parts) > 1:
-            variants.append("/".join(parts[1:]))
-            variants.append(parts[-1])
-        return variants
-
-    def build_aliases(row):
-        clean_name = strip_provider_prefix(row.get("or_name"))
-        values = [row.get("or_name"), clean_name, row.get("or_canonical_slug")] + id_variants(
-            row.get("or_id")
-        )
-        aliases = {normalize_name(v) for v in values}
-        aliases.update({model_core_key(v) for v in values})
-        aliases.discard("")
-        return sorted(aliases)
-
-    df["or_aliases"] = df.apply(build_aliases, axis=1)
-
-    def choose_primary(row):
-        ordered = [
-            normalize_name(row.get("or_canonical_slug")),
-            normalize_name(row.get("or_name")),
-        ]
-        ordered.extend(normalize_name(v) for v in id_variants(row.get("or_id")))
-        return first_non_empty(ordered) or ""
-
-    df["or_primary_key"] = df.apply(choose_primary, axis=1)
+    # or_id 的三种写法：完整 id、去掉供应商前缀、最后一段
+    id_parts = df["or_id"].map(lambda v: v.split("/") if isinstance(v, str) else None)
+    id_variants = [
+        df["or_id"],
+        id_parts.map(lambda parts: "/".join(parts[1:]) if parts and len(parts) > 1 else None),
+        id_parts.map(lambda parts: parts[-1] if parts and len(parts) > 1 else None),
+    ]
+    clean_name = strip_provider_prefix_series(df["or_name"])
+    sources = [df["or_name"], clean_name, df["or_canonical_slug"], *id_variants]
+    norms = [normalize_name_series(v) for v in sources]
+    cores = [model_core_key_series(v) for v in sources]
+    df["or_aliases"] = [sorted(set(values) - {""}) for values in zip(*norms, *cores)]
+
+    # 主键优先级：canonical_slug > name > id 各变体，取第一个非空
+    ordered = [norms[2], norms[0], norms[3], norms[4], norms[5]]
+    df["or_primary_key"] = [next((v for v in values if v), "") for values in zip(*ordered)]
     df["or_core_key"] = (
-        df["or_name"]
-        .apply(lambda x: model_core_key(strip_provider_prefix(x)))
+        model_core_key_series(clean_name)
         .replace("", pd.NA)
-        .fillna(df["or_canonical_slug"].apply(model_core_key))
-        .fillna(df["or_id"].apply(model_core_key))
+        .fillna(cores[2])
+        .fillna(cores[3])
         .fillna("")
     )
 
@@ -281,72 +304,271 @@ def score_pair(aa_row, or_row, shared_aliases):
         if aa_core == or_core:
             score += 8
         else:
-            aa_tokens = split_tokens(aa_core)
-            or_tokens = split_tokens(or_core)
-            if aa_tokens and or_tokens:
-                jaccard = len(aa_tokens & or_tokens) / len(aa_tokens | or_tokens)
-                if jaccard >= 0.8:
-                    score += 4
-            ratio = SequenceMatcher(None, aa_core, or_core).ratio()
-            if ratio >= 0.92:
-                score += 3
+            score += core_similarity_bonus(aa_core, or_core)
     return score
 
 
-def match_and_merge(df_aa, df_or):
-    aa = df_aa.reset_index(drop=True).copy()
-    aa["aa_idx"] = aa.index
-    or_df = df_or.reset_index(drop=True).copy()
-    or_df["or_idx"] = or_df.index
+def core_similarity_bonus(aa_core, or_core):
+    """score_pair 中核心名不相同时的加分：token Jaccard >= 0.8 加 4，字符相似度 >= 0.92 加 3。"""
+    bonus = 0
+    aa_tokens = split_tokens(aa_core)
+    or_tokens = split_tokens(or_core)
+    if aa_tokens and or_tokens:
+        jaccard = len(aa_tokens & or_tokens) / len(aa_tokens | or_tokens)
+        if jaccard >= 0.8:
+            bonus += 4
+    if SequenceMatcher(None, aa_core, or_core).ratio() >= 0.92:
+        bonus += 3
+    return bonus
+
+
+def build_match_features(df, prefix):
+    """每条记录预计算一次匹配特征（别名、主键、规范名、核心名），按整数位置 idx 对齐。"""
+    def column(name):
+        return df[name].tolist() if name in df.columns else [None] * len(df)
+
+    names = column(f"{prefix}_name")
+    if prefix == "aa":
+        fallbacks = column("aa_slug")
+        name_norm = normalize_name_series(names).tolist()
+    else:
+        fallbacks = column("or_canonical_slug")
+        name_norm = normalize_name_series(strip_provider_prefix_series(names)).tolist()
+    # 打分用核心名（与 score_pair 一致）；分块用 *_core_key 列
+    score_core = [
+        n or f for n, f in zip(model_core_key_series(names).tolist(), model_core_key_series(fallbacks).tolist())
+    ]
+    return pd.DataFrame(
+        {
+            "idx": range(len(df)),
+            "aliases": [a if isinstance(a, list) else [] for a in column(f"{prefix}_aliases")],
+            "primary": column(f"{prefix}_primary_key"),
+            "block_core": [c if isinstance(c, str) else "" for c in column(f"{prefix}_core_key")],
+            "name_norm": name_norm,
+            "score_core": score_core,
+        }
+    )
+
 
-    alias_to_or_indices = defaultdict(set)
-    core_to_or_indices = defaultdict(set)
-    for _, row in or_df.iterrows():
-        for alias in row.get("or_aliases", []):
-            alias_to_or_indices[alias].add(row["or_idx"])
-        core = row.get("or_core_key", "")
-        if isinstance(core, str) and core:
-            core_to_or_indices[core].add(row["or_idx"])
+def block_candidates(aa_feat, or_feat):
+    """按别名与核心名分块，生成候选边表 (aa_idx, or_idx, shared)，shared 为共享别名集合。"""
+    aa_alias = aa_feat[["idx", "aliases"]].explode("aliases").dropna()
+    or_alias = or_feat[["idx", "aliases"]].explode("aliases").dropna()
+    by_alias = aa_alias.merge(or_alias, on="aliases", suffixes=("_aa", "_or"))
+    shared = (
+        by_alias.groupby(["idx_aa", "idx_or"])["aliases"].agg(frozenset).rename("shared").reset_index()
+    )
 
+    aa_core = aa_feat.loc[aa_feat["block_core"] != "", ["idx", "block_core"]]
+    or_core = or_feat.loc[or_feat["block_core"] != "", ["idx", "block_core"]]
+    by_core = aa_core.merge(or_core, on="block_core", suffixes=("_aa", "_or"))[["idx_aa", "idx_or"]]
+
+    edges = shared.merge(by_core.drop_duplicates(), on=["idx_aa", "idx_or"], how="outer")
+    edges["shared"] = edges["shared"].apply(lambda x: x if isinstance(x, frozenset) else frozenset())
+    return edges.rename(columns={"idx_aa": "aa_idx", "idx_or": "or_idx"})
+
+
+def score_edges(edges, aa_feat, or_feat):
+    """对候选边表批量打分，结果与逐对调用 score_pair 相同，并给出 match_reason / match_key。"""
+    if edges.empty:
+        return edges.assign(score=pd.Series(dtype="int64"), match_key="", match_reason="")
+    aa = aa_feat.set_index("idx").loc[edges["aa_idx"]].reset_index(drop=True)
+    orr = or_feat.set_index("idx").loc[edges["or_idx"]].reset_index(drop=True)
+
+    n_shared = edges["shared"].map(len).to_numpy()
+    primary_eq = (aa["primary"].fillna("").astype(str) != "") & (aa["primary"].to_numpy() == orr["primary"].to_numpy())
+    name_eq = (aa["name_norm"] != "") & (aa["name_norm"].to_numpy() == orr["name_norm"].to_numpy())
+    both_core = (aa["score_core"] != "") & (orr["score_core"] != "")
+    core_eq = both_core & (aa["score_core"].to_numpy() == orr["score_core"].to_numpy())
+
+    # 核心名不同的边才需要 Jaccard / SequenceMatcher，每个 (aa_core, or_core) 只算一次
+    fuzzy_mask = (both_core & ~core_eq).to_numpy()
+    pairs = list(zip(aa["score_core"][fuzzy_mask], orr["score_core"][fuzzy_mask]))
+    bonus_by_pair = {pair: core_similarity_bonus(*pair) for pair in set(pairs)}
+    fuzzy_bonus = pd.Series(0, index=edges.index)
+    fuzzy_bonus[fuzzy_mask] = [bonus_by_pair[pair] for pair in pairs]
+
+    scored = edges.copy()
+    scored["score"] = (
+        n_shared + 5 * primary_eq.astype(int) + 2 * name_eq.astype(int) + 8 * core_eq.astype(int) + fuzzy_bonus
+    ).astype(int).to_numpy()
+    scored["match_reason"] = "fuzzy"
+    scored.loc[n_shared > 0, "match_reason"] = "alias_overlap"
+    scored.loc[core_eq.to_numpy(), "match_reason"] = "core_name_exact"
+    scored["match_key"] = edges["shared"].map(lambda x: min(x) if x else "")
+    return scored
+
+
+def assign_greedy(scored):
+    """按 AA 记录顺序贪心分配：每条 AA 取未被占用候选中得分最高者，同分取 or_idx 最小者。"""
     used_or = set()
     pairs = []
-    for _, aa_row in aa.iterrows():
-        aa_aliases = set(aa_row.get("aa_aliases", []))
-        candidate_indices = set()
-        for alias in aa_aliases:
-            candidate_indices |= alias_to_or_indices.get(alias, set())
-        aa_core = aa_row.get("aa_core_key", "")
-        if isinstance(aa_core, str) and aa_core:
-            candidate_indices |= core_to_or_indices.get(aa_core, set())
-        candidate_indices -= used_or
-
-        if not candidate_indices:
+    ordered = scored.sort_values(["aa_idx", "score", "or_idx"], ascending=[True, False, True])
+    current_aa = None
+    for aa_idx, or_idx, score, match_key, reason in ordered[
+        ["aa_idx", "or_idx", "score", "match_key", "match_reason"]
+    ].itertuples(index=False):
+        if aa_idx == current_aa or or_idx in used_or:
             continue
+        current_aa = aa_idx
+        used_or.add(or_idx)
+        pairs.append(
+            {
+                "aa_idx": aa_idx,
+                "or_idx": or_idx,
+                "score": score,
+                "match_key": match_key,
+                "match_reason": reason,
+            }
+        )
+    return pairs
+
+
+def _edge_pair(row):
+    return {
+        "aa_idx": row.aa_idx,
+        "or_idx": row.or_idx,
+        "score": row.score,
+        "match_key": row.match_key,
+        "match_reason": row.match_reason,
+    }
+
+
+def _sorted_edge_pairs(rows):
+    used_aa, used_or = set(), set()
+    pairs = []
+    for row in sorted(rows, key=lambda r: (-r.score, r.aa_idx, r.or_idx)):
+        if row.aa_idx in used_aa or row.or_idx in used_or:
+            continue
+        used_aa.add(row.aa_idx)
+        used_or.add(row.or_idx)
+        pairs.append(_edge_pair(row))
+    return pairs
+
+
+def assign_sorted_edges(scored):
+    """全局按分数从高到低取边（同分按 aa_idx、or_idx 升序），两端都未占用才接受。"""
+    return _sorted_edge_pairs(scored.itertuples(index=False))
+
+
+def _hungarian_min(cost):
+    """最小代价指派（行数 <= 列数），返回每行对应的列下标。O(n^2·m)。"""
+    n, m = len(cost), len(cost[0])
+    inf = float("inf")
+    u, v = [0] * (n + 1), [0] * (m + 1)
+    p, way = [0] * (m + 1), [0] * (m + 1)
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = [inf] * (m + 1)
+        used = [False] * (m + 1)
+        while True:
+            used[j0] = True
+            i0, delta, j1 = p[j0], inf, 0
+            row = cost[i0 - 1]
+            for j in range(1, m + 1):
+                if not used[j]:
+                    cur = row[j - 1] - u[i0] - v[j]
+                    if cur < minv[j]:
+                        minv[j], way[j] = cur, j0
+                    if minv[j] < delta:
+                        delta, j1 = minv[j], j
+            for j in range(m + 1):
+                if used[j]:
+                    u[p[j]] += delta
+                    v[j] -= delta
+                else:
+                    minv[j] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+    assignment = [-1] * n
+    for j in range(1, m + 1):
+        if p[j]:
+            assignment[p[j] - 1] = j - 1
+    return assignment
+
+
+def _edge_components(rows):
+    """按候选边把 AA/OR 记录划分为连通分量，返回每个分量的边列表。"""
+    parent = {}
+
+    def find(x):
+        while parent.setdefault(x, x) != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for row in rows:
+        ra, ro = find(("aa", row.aa_idx)), find(("or", row.or_idx))
+        if ra != ro:
+            parent[ra] = ro
+    components = defaultdict(list)
+    for row in rows:
+        components[find(("aa", row.aa_idx))].append(row)
+    return list(components.values())
+
+
+def assign_optimal(scored):
+    """在每个连通分量内求总分最大的一对一分配（匈牙利算法）；超大分量退化为 sorted。"""
+    pairs = []
+    for comp in _edge_components(list(scored.itertuples(index=False))):
+        aa_ids = sorted({row.aa_idx for row in comp})
+        or_ids = sorted({row.or_idx for row in comp})
+        if len(aa_ids) == 1 or len(or_ids) == 1 or min(len(aa_ids), len(or_ids)) > MAX_OPTIMAL_COMPONENT:
+            # 单侧只有一个节点时 sorted 即最优
+            pairs.extend(_sorted_edge_pairs(comp))
+            continue
+
+        transpose = len(aa_ids) > len(or_ids)
+        rows, cols = (or_ids, aa_ids) if transpose else (aa_ids, or_ids)
+        by_cell = {((row.or_idx, row.aa_idx) if transpose else (row.aa_idx, row.or_idx)): row for row in comp}
+        top = max(row.score for row in comp)
+        # 非候选对视为权重 0（即不配对）；最大化总分等价于最小化 top - score
+        cost = [[top - by_cell[(r, c)].score if (r, c) in by_cell else top for c in cols] for r in rows]
+        for r_pos, c_pos in enumerate(_hungarian_min(cost)):
+            row = by_cell.get((rows[r_pos], cols[c_pos]))
+            if row is not None:
+                pairs.append(_edge_pair(row))
+    return pairs
+
+
+def assign_pairs(scored, mode=MATCH_ASSIGNMENT):
+    """按 mode 分配一对一匹配；非 greedy 模式时打印与贪心结果的差异。"""
+    greedy = assign_greedy(scored)
+    if mode == "greedy":
+        return greedy
+    if mode == "sorted":
+        pairs = assign_sorted_edges(scored)
+    elif mode == "optimal":
+        pairs = assign_optimal(scored)
+    else:
+        raise ValueError(f"未知的 MATCH_ASSIGNMENT: {mode}（可选 greedy / sorted / optimal）")
+
+    before = {p["aa_idx"]: p["or_idx"] for p in greedy}
+    after = {p["aa_idx"]: p["or_idx"] for p in pairs}
+    changed = sum(1 for aa_idx in before.keys() | after.keys() if before.get(aa_idx) != after.get(aa_idx))
+    print(
+        f"分配方式 {mode}：{len(after)} 对（贪心 {len(before)} 对），{changed} 条 AA 记录的配对发生变化，"
+        f"总分 {sum(p['score'] for p in greedy)} → {sum(p['score'] for p in pairs)}"
+    )
+    return pairs
+
+
+def match_and_merge(df_aa, df_or):
+    aa = df_aa.reset_index(drop=True).copy()
+    aa["aa_idx"] = aa.index
+    or_df = df_or.reset_index(drop=True).copy()
+    or_df["or_idx"] = or_df.index
 
-        best = None
-        for or_idx in candidate_indices:
-            or_row = or_df.loc[or_df["or_idx"] == or_idx].iloc[0]
-            shared = aa_aliases & set(or_row.get("or_aliases", []))
-            pair_score = score_pair(aa_row, or_row, shared)
-            aa_core = model_core_key(aa_row.get("aa_name")) or model_core_key(aa_row.get("aa_slug"))
-            or_core = model_core_key(or_row.get("or_name")) or model_core_key(or_row.get("or_canonical_slug"))
-            if aa_core and or_core and aa_core == or_core:
-                reason = "core_name_exact"
-            elif shared:
-                reason = "alias_overlap"
-            else:
-                reason = "fuzzy"
-            if best is None or pair_score > best["score"]:
-                best = {
-                    "aa_idx": aa_row["aa_idx"],
-                    "or_idx": or_idx,
-                    "score": pair_score,
-                    "match_key": first_non_empty(sorted(shared)) or "",
-                    "match_reason": reason,
-                }
-        if best is not None:
-            used_or.add(best["or_idx"])
-            pairs.append(best)
+    aa_feat = build_match_features(aa, "aa")
+    or_feat = build_match_features(or_df, "or")
+    edges = block_candidates(aa_feat, or_feat)
+    pairs = assign_pairs(score_edges(edges, aa_feat, or_feat))
 
     pair_df = pd.DataFrame(pairs)
     if pair_df.empty:
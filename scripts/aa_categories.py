@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""Single-pass pivot of AA media `categories` shared by pipeline.py and the local split fetcher.
+
+Each category item of an AA media record carries a style, subject-matter or
+format label plus elo/ci95/appearances. `category_entries` turns one record's
+items into CategoryEntry tuples with the display label, its column base name
+and the normalized axis labels computed once, so callers neither re-run the
+label regexes per output nor re-normalize labels per requested column.
+"""
+
+import json
+import re
+from functools import lru_cache
+from typing import NamedTuple
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_SLUG_INVALID_RE = re.compile(r"[^a-z0-9_]+")
+_UNDERSCORES_RE = re.compile(r"_+")
+
+
+class CategoryEntry(NamedTuple):
+    style: str  # normalized labels, "" when the axis is unset
+    subject: str
+    format: str
+    label: str  # e.g. "Style: Anime | Format: Short Prompt"
+    column: str  # e.g. "category_style_anime"
+    elo: object
+    ci95: object
+    appearances: object
+
+
+@lru_cache(maxsize=4096)
+def slugify_text(value: str) -> str:
+    text = (value or "").strip().lower()
+    text = _WHITESPACE_RE.sub("_", text)
+    text = _SLUG_INVALID_RE.sub("_", text)
+    text = _UNDERSCORES_RE.sub("_", text).strip("_")
+    return text or "unknown"
+
+
+def normalize_category_label(text) -> str:
+    if not isinstance(text, str):
+        return ""
+    t = text.strip().lower()
+    t = t.replace("&", "and")
+    return _WHITESPACE_RE.sub(" ", t)
+
+
+def _axis_texts(item: dict) -> tuple[str, str, str]:
+    values = (item.get("style_category"), item.get("subject_matter_category"), item.get("format_category"))
+    return tuple(v if isinstance(v, str) else "" for v in values)
+
+
+def category_label(item: dict) -> str:
+    return _label_and_column(*(v.strip() for v in _axis_texts(item)))[0]
+
+
+@lru_cache(maxsize=4096)
+def _label_and_column(style: str, subject: str, fmt: str) -> tuple[str, str]:
+    parts = []
+    if style:
+        parts.append(f"Style: {style}")
+    if subject:
+        parts.append(f"Subject: {subject}")
+    if fmt:
+        parts.append(f"Format: {fmt}")
+    if not parts:
+        parts.append("Category: Unspecified")
+    label = " | ".join(parts)
+    return label, f"category_{slugify_text(label)}"
+
+
+@lru_cache(maxsize=4096)
+def _normalized_axes(style: str, subject: str, fmt: str) -> tuple[str, str, str]:
+    return normalize_category_label(style), normalize_category_label(subject), normalize_category_label(fmt)
+
+
+def parse_categories(value):
+    if isinstance(value, list):
+        return value
+    if isinstance(value, str):
+        text = value.strip()
+        if not text or text == "[]":
+            return []
+        try:
+            parsed = json.loads(text)
+            return parsed if isinstance(parsed, list) else []
+        except json.JSONDecodeError:
+            return []
+    return []
+
+
+def category_entries(categories) -> list[CategoryEntry]:
+    """One record's categories (list or JSON text) as CategoryEntry tuples, in source order."""
+    entries = []
+    for item in parse_categories(categories):
+        style, subject, fmt = _axis_texts(item)
+        label, column = _label_and_column(style.strip(), subject.strip(), fmt.strip())
+        entries.append(
+            CategoryEntry(
+                *_normalized_axes(style, subject, fmt),
+                label,
+                column,
+                item.get("elo"),
+                item.get("ci95"),
+                item.get("appearances"),
+            )
+        )
+    return entries
+
+
+def pivot_categories(records) -> list[list[CategoryEntry]]:
+    """Long (record, category) table: the category entries of every record, in record order."""
+    return [category_entries(rec.get("categories")) for rec in records]
+
+
+def category_elo_index(entries) -> dict[tuple[str, str], object]:
+    """(axis, normalized label) -> elo of the first entry carrying that label; axis is style/subject/format."""
+    index = {}
+    for entry in entries:
+        for key in (("style", entry.style), ("subject", entry.subject), ("format", entry.format)):
+            if key[1] and key not in index:
+                index[key] = entry.elo
+    return index
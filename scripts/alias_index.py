@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""Persistent AA↔OpenRouter alias index shared by pipeline.py and the local split fetcher.
+
+The index maps every normalized alias of an OpenRouter model (id, name,
+provider-less name and canonical slug, each as normalize_name and
+model_core_key) to that model's context data. It is pickled under
+ALIAS_INDEX_DIR keyed by a hash of the OR fields it depends on, so it is
+rebuilt only when those fields change or ALIAS_INDEX_VERSION is bumped.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import re
+from pathlib import Path
+
+ALIAS_INDEX_VERSION = 1
+ALIAS_INDEX_DIR = Path(
+    os.environ.get("ALIAS_INDEX_DIR") or Path(__file__).resolve().parent.parent / ".cache" / "alias_index"
+)
+
+_SEPARATORS_RE = re.compile(r"[\s_]+")
+_NAME_INVALID_RE = re.compile(r"[^a-z0-9\-/]")
+_PROVIDER_PREFIX_RE = re.compile(r"^[^:]{1,40}:\s*")
+_DATE_NOISE_RES = (
+    re.compile(r"\([^)]*\)"),
+    re.compile(r"\b(19|20)\d{2}\b"),
+    re.compile(r"\b\d{8}\b|\b\d{6}\b|\b\d{4}\b"),
+    re.compile(r"\b(?:jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)[a-z]*[-\s']?\d{2,4}\b"),
+    re.compile(r"\b(?:preview|latest|stable|release|experimental|exp)\b"),
+)
+_SPACES_RE = re.compile(r"\s+")
+_CHANNEL_TAIL_RE = re.compile(r"(?:[-_/](?:free|beta|alpha|chat|instruct|latest))+$")
+_DASHES_RE = re.compile(r"-{2,}")
+
+
+def normalize_name(name):
+    if not isinstance(name, str):
+        return ""
+    text = name.lower().strip()
+    text = text.replace("gpt-4o", "gpt4o").replace("gpt-4-omni", "gpt4o")
+    text = _SEPARATORS_RE.sub("-", text)
+    text = _NAME_INVALID_RE.sub("", text)
+    return text.strip("-/")
+
+
+def strip_provider_prefix(text):
+    if not isinstance(text, str):
+        return ""
+    return _PROVIDER_PREFIX_RE.sub("", text).strip()
+
+
+def remove_date_noise(text):
+    if not isinstance(text, str):
+        return ""
+    t = text.lower()
+    for pattern in _DATE_NOISE_RES:
+        t = pattern.sub(" ", t)
+    return _SPACES_RE.sub(" ", t).strip()
+
+
+def model_core_key(value):
+    if not isinstance(value, str):
+        return ""
+    text = strip_provider_prefix(value)
+    text = remove_date_noise(text)
+    text = normalize_name(text)
+    text = _CHANNEL_TAIL_RE.sub("", text)
+    return _DASHES_RE.sub("-", text).strip("-/")
+
+
+def _column(func, values) -> list[str]:
+    # Model names repeat heavily across a column; compute each distinct value once.
+    cache = {}
+    out = []
+    for value in values:
+        try:
+            result = cache[value]
+        except KeyError:
+            result = cache[value] = func(value)
+        out.append(result)
+    return out
+
+
+def normalize_names(values) -> list[str]:
+    """normalize_name over a whole column."""
+    return _column(normalize_name, values)
+
+
+def strip_provider_prefixes(values) -> list[str]:
+    """strip_provider_prefix over a whole column."""
+    return _column(strip_provider_prefix, values)
+
+
+def model_core_keys(values) -> list[str]:
+    """model_core_key over a whole column."""
+    return _column(model_core_key, values)
+
+
+def make_aliases(slug: str, name: str, canonical: str = "") -> set[str]:
+    candidates = [slug, name, strip_provider_prefix(name), canonical]
+    aliases = set()
+    for c in candidates:
+        aliases.add(normalize_name(c))
+        aliases.add(model_core_key(c))
+    aliases.discard("")
+    return aliases
+
+
+def make_aliases_many(slugs, names, canonicals=None) -> list[set[str]]:
+    """make_aliases for parallel columns, normalizing each column in one pass."""
+    slugs, names = list(slugs), list(names)
+    canonicals = list(canonicals) if canonicals is not None else [""] * len(slugs)
+    columns = [slugs, names, strip_provider_prefixes(names), canonicals]
+    normalized = [(normalize_names(col), model_core_keys(col)) for col in columns]
+    result = []
+    for i in range(len(slugs)):
+        aliases = set()
+        for norms, cores in normalized:
+            aliases.add(norms[i])
+            aliases.add(cores[i])
+        aliases.discard("")
+        result.append(aliases)
+    return result
+
+
+def _or_projection(rec: dict) -> tuple:
+    modalities = (rec.get("architecture") or {}).get("input_modalities")
+    return (
+        rec.get("id") or "",
+        rec.get("name") or "",
+        rec.get("canonical_slug") or "",
+        rec.get("context_length"),
+        modalities,
+    )
+
+
+def or_payload_hash(or_records) -> str:
+    """Hash of the OR fields the index depends on (pricing etc. changes do not invalidate it)."""
+    digest = hashlib.sha256()
+    for rec in or_records:
+        digest.update(json.dumps(_or_projection(rec), ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8"))
+        digest.update(b"\n")
+    return digest.hexdigest()[:32]
+
+
+def build_alias_index(or_records) -> dict[str, dict]:
+    """alias -> {"context_length", "input_modalities"}; the first OR record with an alias wins."""
+    index = {}
+    projections = [_or_projection(rec) for rec in or_records]
+    alias_sets = make_aliases_many(
+        [p[0] for p in projections], [p[1] for p in projections], [p[2] for p in projections]
+    )
+    for (_, _, _, context, modalities), aliases in zip(projections, alias_sets):
+        entry = {"context_length": context, "input_modalities": modalities}
+        for alias in aliases:
+            if alias not in index:
+                index[alias] = entry
+    return index
+
+
+def load_alias_index(or_records, cache_dir: Path | None = None) -> dict[str, dict]:
+    """Load the pickled index for this OR payload, building and saving it on a miss."""
+    cache_dir = Path(cache_dir or ALIAS_INDEX_DIR)
+    path = cache_dir / f"or_alias_index.v{ALIAS_INDEX_VERSION}.pickle"
+    payload_hash = or_payload_hash(or_records)
+    try:
+        with path.open("rb") as f:
+            cached = pickle.load(f)
+        if cached.get("version") == ALIAS_INDEX_VERSION and cached.get("or_hash") == payload_hash:
+            return cached["index"]
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, KeyError, TypeError):
+        pass
+
+    index = build_alias_index(or_records)
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        with tmp.open("wb") as f:
+            pickle.dump(
+                {"version": ALIAS_INDEX_VERSION, "or_hash": payload_hash, "index": index},
+                f,
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+        os.replace(tmp, path)
+    except OSError as e:
+        print(f"alias index: could not save {path}: {e}")
+    return index
+
+
+def lookup_aliases(index: dict, aa_slug: str, aa_name: str):
+    """Entry for an AA record: its normalized slug first, then any other alias; None when unmatched."""
+    primary = normalize_name(aa_slug)
+    if primary in index:
+        return index[primary]
+    for alias in make_aliases(aa_slug, aa_name):
+        if alias in index:
+            return index[alias]
+    return None
+
+
+def lookup_aliases_many(index: dict, aa_slugs, aa_names) -> list:
+    """lookup_aliases for parallel columns of AA slugs and names."""
+    aa_slugs, aa_names = list(aa_slugs), list(aa_names)
+    primaries = normalize_names(aa_slugs)
+    result = [index.get(primary) for primary in primaries]
+    misses = [i for i, (primary, entry) in enumerate(zip(primaries, result)) if primary not in index]
+    if misses:
+        alias_sets = make_aliases_many([aa_slugs[i] for i in misses], [aa_names[i] for i in misses])
+        for i, aliases in zip(misses, alias_sets):
+            result[i] = next((index[alias] for alias in aliases if alias in index), None)
+    return result
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+fuzzy_index.py  –  Indexed replacement for difflib.get_close_matches(word, keys, n=1).
+
+FuzzyIndex returns exactly what get_close_matches would return for n=1 (the
+key with the highest SequenceMatcher ratio >= cutoff, ties broken by the
+larger key), without scanning every key:
+
+  • each key is indexed under its (character, occurrence) tokens, e.g. "gpt4o"
+    -> (g,1) (p,1) (t,1) (4,1) (o,1); counting the postings of the query's
+    tokens gives the multiset overlap with every key at once, i.e. difflib's
+    quick_ratio, an upper bound on ratio()
+  • postings are kept per key length, so lengths that cannot reach the
+    cutoff (difflib's real_quick_ratio) are never counted, and within a
+    length the keys are read in descending overlap until the bound drops
+    below the cutoff
+  • candidates are scored in descending bound order and the scan stops once
+    the bound falls below the best ratio found
+
+Usage (benchmark against difflib):
+    python scripts/fuzzy_index.py [--queries 2000]
+"""
+
+import argparse
+import csv
+import random
+import time
+from collections import Counter
+from difflib import SequenceMatcher, get_close_matches
+from pathlib import Path
+
+DEFAULT_CUTOFF = 0.80
+
+
+def _ratio(matches: int, length: int) -> float:
+    # Same formula as difflib._calculate_ratio, so comparisons are exact.
+    return 2.0 * matches / length if length else 1.0
+
+
+class FuzzyIndex:
+    def __init__(self, keys=(), cutoff: float = DEFAULT_CUTOFF):
+        self.cutoff = cutoff
+        self._keys: list[str] = []
+        self._ids: dict[str, int] = {}
+        # key length -> (character, occurrence) token -> key ids
+        self._postings: dict[int, dict[tuple[str, int], list[int]]] = {}
+        for key in keys:
+            self.add(key)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, key) -> bool:
+        return key in self._ids
+
+    def add(self, key: str) -> None:
+        if key in self._ids:
+            return
+        key_id = len(self._keys)
+        self._keys.append(key)
+        self._ids[key] = key_id
+        postings = self._postings.setdefault(len(key), {})
+        for token in _tokens(key):
+            postings.setdefault(token, []).append(key_id)
+
+    def best_match(self, query: str) -> str | None:
+        """Return get_close_matches(query, keys, n=1, cutoff)[0], or None."""
+        qlen = len(query)
+        qtokens = list(_tokens(query))
+        cutoff = self.cutoff
+        bounded = []
+        for length, postings in self._postings.items():
+            total = length + qlen
+            if _ratio(min(length, qlen), total) < cutoff:
+                continue
+            overlaps = Counter()
+            for token in qtokens:
+                posting = postings.get(token)
+                if posting:
+                    overlaps.update(posting)
+            for key_id, overlap in overlaps.most_common():
+                bound = _ratio(overlap, total)
+                if bound < cutoff:
+                    break
+                bounded.append((bound, self._keys[key_id]))
+        if not bounded:
+            return None
+
+        bounded.sort(reverse=True)
+        matcher = SequenceMatcher()
+        matcher.set_seq2(query)
+        best = None
+        for bound, key in bounded:
+            if best is not None and bound < best[0]:
+                break
+            matcher.set_seq1(key)
+            score = matcher.ratio()
+            if score >= cutoff and (best is None or (score, key) > best):
+                best = (score, key)
+        return best[1] if best else None
+
+
+def _tokens(text: str):
+    """(character, occurrence) pairs: the multiset of `text` as distinct tokens."""
+    for ch, count in Counter(text).items():
+        for occurrence in range(1, count + 1):
+            yield ch, occurrence
+
+
+# ── Benchmark ─────────────────────────────────────────────────────────────────
+
+def _sample_keys() -> list[str]:
+    """Normalized series names from the repo previews, padded with synthetic ones."""
+    root = Path(__file__).resolve().parent.parent
+    keys: set[str] = set()
+    for path in (root / "Comment" / "series_preview.csv", root / "Comment" / "model_series_mapping_sync_audit.csv"):
+        if path.exists():
+            with path.open("r", encoding="utf-8-sig", newline="") as f:
+                for row in csv.DictReader(f):
+                    for col in ("display_name", "series_name", "aa_name"):
+                        value = "".join(ch for ch in (row.get(col) or "").lower() if ch.isalnum())
+                        if value:
+                            keys.add(value)
+    rng = random.Random(7)
+    brands = ["gpt", "claude", "gemini", "qwen", "llama", "mistral", "deepseek", "glm", "kimi", "grok"]
+    tiers = ["", "mini", "pro", "flash", "sonnet", "opus", "max", "turbo", "lite", "instruct"]
+    while len(keys) < 3000:
+        keys.add(f"{rng.choice(brands)}{rng.randint(1, 5)}{rng.randint(0, 9)}{rng.choice(tiers)}")
+    return sorted(keys)
+
+
+def _mutate(rng: random.Random, key: str) -> str:
+    chars = list(key)
+    for _ in range(rng.randint(0, 3)):
+        op = rng.random()
+        pos = rng.randrange(len(chars) + 1)
+        if op < 0.4 and chars:
+            del chars[min(pos, len(chars) - 1)]
+        elif op < 0.8:
+            chars.insert(pos, rng.choice("abcdefghijklmnopqrstuvwxyz0123456789"))
+        elif chars:
+            chars[min(pos, len(chars) - 1)] = rng.choice("abcdefghijklmnopqrstuvwxyz")
+    return "".join(chars)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark FuzzyIndex against difflib.get_close_matches.")
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--cutoff", type=float, default=DEFAULT_CUTOFF)
+    args = parser.parse_args()
+
+    keys = _sample_keys()
+    rng = random.Random(11)
+    queries = [_mutate(rng, rng.choice(keys)) for _ in range(args.queries)]
+
+    started = time.perf_counter()
+    expected = []
+    for q in queries:
+        matches = get_close_matches(q, list(keys), n=1, cutoff=args.cutoff)
+        expected.append(matches[0] if matches else None)
+    difflib_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    index = FuzzyIndex(keys, cutoff=args.cutoff)
+    build_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    actual = [index.best_match(q) for q in queries]
+    index_seconds = time.perf_counter() - started
+
+    mismatches = sum(1 for a, b in zip(expected, actual) if a != b)
+    matched = sum(1 for a in expected if a is not None)
+    print(f"keys={len(keys)} queries={len(queries)} matched={matched} mismatches={mismatches}")
+    print(f"difflib:    {difflib_seconds:.3f}s ({difflib_seconds / len(queries) * 1000:.2f} ms/query)")
+    print(
+        f"FuzzyIndex: {index_seconds:.3f}s ({index_seconds / len(queries) * 1000:.2f} ms/query), "
+        f"build {build_seconds:.3f}s, speedup x{difflib_seconds / max(index_seconds, 1e-9):.1f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -10,32 +10,50 @@ Two-phase import for third-party social posts:
     • Upsert new series into model_series (skip existing by slug)
     • Update model_snapshots.series_id FK
 
-  Phase 2 – Import social_posts
-    • Read all CSVs from Comment/
-    • Match each row's `query` field to a model_series (fuzzy, 0.8 threshold)
-    • Unknown queries auto-create a new series entry
-    • Upsert rows into social_posts, skipping duplicate uid
+  Phase 2 – Import social_posts and model_review_posts
+    • Read each CSV from Comment/ once
+    • Match each distinct `query` to a model_series (fuzzy, 0.8 threshold);
+      matches are cached on disk per model_series/override/rules fingerprint
+    • Unknown queries auto-create new series entries in one bulk upsert per file
+    • Fan every row out to two upload queues: social_posts and
+      model_review_posts (rows with an overall score; duplicate source_uid
+      skipped)
+    • social_posts uids already in the table (fetched once up front) are not
+      sent again; the rest go through the insert_social_posts RPC, which
+      skips duplicate uid server-side and reports inserted vs skipped counts
 
 Usage:
     SUPABASE_URL=... SUPABASE_SERVICE_ROLE_KEY=... python scripts/import_social_comments.py
 """
 
 import csv
+import hashlib
+import json
 import os
 import random
 import re
 import sys
-from difflib import get_close_matches
 from pathlib import Path
 
 import requests
 
+import series_rules
+from fuzzy_index import FuzzyIndex
+from series_rules import extract_series_name, infer_provider, make_slug, normalize_for_match
+from supabase_io import AdaptiveBatcher, QueueUploader, bulk_set_snapshot_series, rpc_missing, stream_rows
+
 # ── Config ────────────────────────────────────────────────────────────────────
 
 SUPABASE_URL = os.environ.get("SUPABASE_URL", "").rstrip("/")
 SERVICE_ROLE_KEY = os.environ.get("SUPABASE_SERVICE_ROLE_KEY", "")
-BATCH_SIZE = 50
+BATCH_SIZE = 50  # initial rows per write batch; AdaptiveBatcher resizes it
+SOCIAL_POSTS_RPC = "insert_social_posts"
 COMMENT_DIR = Path(__file__).parent.parent / "Comment"
+# resolution_key -> series_id matches from earlier runs, reused while the fingerprint holds.
+RESOLUTION_CACHE_VERSION = 2
+SERIES_CACHE_DIR = Path(
+    os.environ.get("SERIES_CACHE_DIR") or Path(__file__).resolve().parent.parent / ".cache" / "series_resolution"
+)
 
 # ── Query overrides (raw CSV query → series slug) ─────────────────────────────
 # These bypass the fuzzy-match logic for queries that canonicalize incorrectly.
@@ -188,27 +206,6 @@ def build_review_post_row(row: dict, series_id: str | None) -> dict | None:
     }
 
 
-PROVIDER_PREFIXES = {
-    "qwen": "alibaba",
-    "glm": "zhipu",
-    "kimi": "moonshot",
-    "minimax": "minimax",
-    "gemini": "google",
-    "gemma": "google",
-    "claude": "anthropic",
-    "gpt": "openai",
-    "o1": "openai",
-    "o3": "openai",
-    "o4": "openai",
-    "o5": "openai",
-    "deepseek": "deepseek",
-    "llama": "meta",
-    "mistral": "mistral",
-    "grok": "xai",
-    "doubao": "bytedance",
-    "ernie": "baidu",
-}
-
 # ── Helpers ───────────────────────────────────────────────────────────────────
 
 def api_headers(prefer: str = "") -> dict:
@@ -222,345 +219,39 @@ def api_headers(prefer: str = "") -> dict:
     return h
 
 
-def _normalize_spaces(text: str) -> str:
-    return re.sub(r"\s+", " ", text).strip()
-
-
-def _extract_version_token(text: str) -> str | None:
-    """
-    Extract versions like 4.5, 3.1, 3n from strings such as:
-    - GLM 4.5V
-    - GPT-4.1 mini
-    - Gemma 3n E4B
-    """
-    lowered = text.lower()
-
-    # Decimal versions first: 4.5, 3.1 (also supports trailing letter: 4.5v)
-    m = re.search(r"\b(\d+(?:\.\d+)+)(?=[a-z]?\b)", lowered)
-    if m:
-        return m.group(1)
-
-    # n-suffixed versions: 3n
-    m = re.search(r"\b(\d+n)\b", lowered)
-    if m:
-        return m.group(1)
-
-    # Integer versions: 4, 5
-    m = re.search(r"\b(\d+)\b", lowered)
-    if m:
-        return m.group(1)
-
-    return None
-
-
-def _extract_prefixed_version(text: str, prefixes: tuple[str, ...]) -> str | None:
-    """Extract prefixed versions like V3.2 / R1 / K2.5 / M2.5."""
-    prefix_group = "|".join(re.escape(p.lower()) for p in prefixes)
-    m = re.search(
-        rf"\b({prefix_group})\s*([0-9]+(?:\.[0-9]+)?)(?=[a-z]?\b)",
-        text.lower(),
-    )
-    if not m:
-        return None
-    return f"{m.group(1).upper()}{m.group(2)}"
-
-
-def _extract_version_after_brand(text: str, brand: str) -> str | None:
-    """
-    Extract version when attached to brand token:
-    - qwen3.5 -> 3.5
-    - lfm2.5 -> 2.5
-    - olmo3.1 -> 3.1
-    """
-    m = re.search(rf"{re.escape(brand.lower())}\s*[-_ ]*([0-9]+(?:\.[0-9]+)?)", text.lower())
-    if m:
-        return m.group(1)
-    return None
-
-
-def _has_brand(text: str, brands: tuple[str, ...]) -> bool:
-    low = text.lower()
-    return any(b in low for b in brands)
-
-
-def _canonicalize_by_family(name: str) -> str:
-    """Collapse model variants into user-facing families (provider-specific)."""
-    low = name.lower()
-
-    # Claude: keep major/minor version + family (Sonnet/Opus/Haiku)
-    if "claude" in low:
-        family = None
-        for fam in ("sonnet", "opus", "haiku"):
-            if re.search(rf"\b{fam}\b", low):
-                family = fam.title()
-                break
-        version = re.search(r"\b(\d+(?:\.\d+)?)\b", low)
-        if version:
-            return _normalize_spaces(f"Claude {version.group(1)} {family or ''}")
-        return _normalize_spaces(f"Claude {family or ''}")
-
-    # DeepSeek: collapse to DeepSeek Vx.y (or Rx when present)
-    if "deepseek" in low:
-        vr = _extract_prefixed_version(low, ("v", "r"))
-        if vr:
-            return f"DeepSeek {vr}"
-        return "DeepSeek"
-
-    # Gemini: collapse to Gemini x.y
-    if "gemini" in low:
-        version = _extract_version_token(low)
-        if version:
-            return f"Gemini {version}"
-        return "Gemini"
-
-    # Gemma: collapse to Gemma 3n / 3 / etc.
-    if "gemma" in low:
-        version = _extract_version_token(low)
-        if version:
-            return f"Gemma {version}"
-        return "Gemma"
-
-    # GLM: collapse to GLM x.y
-    if "glm" in low:
-        version = _extract_version_token(low)
-        if version:
-            return f"GLM {version}"
-        return "GLM"
-
-    # GPT: collapse to GPT x.y
-    if "gpt" in low:
-        version = _extract_version_token(low)
-        if version:
-            return f"GPT {version}"
-        return "GPT"
-
-    # Granite: collapse to Granite x.y
-    if "granite" in low:
-        version = _extract_version_token(low)
-        if version:
-            return f"Granite {version}"
-        return "Granite"
-
-    # Qwen family: Qwen 3 / Qwen 3.5 / Qwen 2.5
-    if "qwen" in low:
-        version = _extract_version_after_brand(low, "qwen") or _extract_version_token(low)
-        if version:
-            return f"Qwen {version}"
-        return "Qwen"
-
-    # Kimi family: keep K prefix when available (K2 / K2.5)
-    if "kimi" in low:
-        k = _extract_prefixed_version(low, ("k",))
-        if k:
-            return f"Kimi {k}"
-        version = _extract_version_token(low)
-        if version:
-            return f"Kimi {version}"
-        return "Kimi"
-
-    # MiniMax family: keep M prefix when available (M1 / M2.5)
-    if "minimax" in low or "mini max" in low:
-        m = _extract_prefixed_version(low, ("m",))
-        if m:
-            return f"MiniMax {m}"
-        version = _extract_version_token(low)
-        if version:
-            return f"MiniMax {version}"
-        return "MiniMax"
-
-    # Llama
-    if "llama" in low:
-        version = _extract_version_token(low)
-        if version:
-            return f"Llama {version}"
-        return "Llama"
-
-    # Grok
-    if "grok" in low:
-        version = _extract_version_token(low)
-        if version:
-            return f"Grok {version}"
-        return "Grok"
-
-    # Mistral variants
-    if _has_brand(low, ("mistral", "ministral", "magistral")):
-        if "ministral" in low:
-            brand = "Ministral"
-        elif "magistral" in low:
-            brand = "Magistral"
-        else:
-            brand = "Mistral"
-        version = _extract_version_token(low)
-        if version:
-            return f"{brand} {version}"
-        return brand
-
-    # OpenAI o-series (o1/o3/o4/o5), collapse mini/pro/preview
-    m = re.search(r"\bo([1345](?:\.\d+)?)\b", low)
-    if m:
-        return f"O{m.group(1)}"
-
-    # K2 family (e.g. K2 V2 / K2 Think V2)
-    if re.search(r"\bk2\b", low):
-        v = _extract_prefixed_version(low, ("v",))
-        if v:
-            return f"K2 {v}"
-        return "K2"
-
-    # Other major brands, collapsed by principal version
-    generic_versioned_brands: list[tuple[str, tuple[str, ...]]] = [
-        ("ERNIE", ("ernie",)),
-        ("Doubao", ("doubao",)),
-        ("EXAONE", ("exaone",)),
-        ("Devstral", ("devstral",)),
-        ("Jamba", ("jamba",)),
-        ("Nova", ("nova",)),
-        ("Phi", ("phi",)),
-        ("LFM", ("lfm",)),
-        ("Solar", ("solar",)),
-        ("Sonar", ("sonar",)),
-        ("Ling", ("ling",)),
-        ("OpenChat", ("openchat",)),
-    ]
-    for display, keys in generic_versioned_brands:
-        if _has_brand(low, keys):
-            key = keys[0]
-            version = _extract_version_after_brand(low, key) or _extract_version_token(low)
-            if version:
-                return f"{display} {version}"
-            return display
-
-    # OLMo family with stable casing
-    if _has_brand(low, ("olmo",)):
-        version = _extract_version_after_brand(low, "olmo") or _extract_version_token(low)
-        if version:
-            return f"OLMo {version}"
-        return "OLMo"
-
-    # Command family (Cohere)
-    if _has_brand(low, ("command",)):
-        version = _extract_version_token(low)
-        if version:
-            return f"Command {version}"
-        if "r" in low:
-            return "Command R"
-        if "a" in low:
-            return "Command A"
-        return "Command"
-
-    # NVIDIA Nemotron family
-    if _has_brand(low, ("nemotron", "nvidia")):
-        version = _extract_version_token(low)
-        if version:
-            return f"NVIDIA Nemotron {version}"
-        return "NVIDIA Nemotron"
-
-    # Tri family: normalize case variants like "Tri 21B think/Think"
-    if re.search(r"\btri\b", low):
-        size = re.search(r"\b(\d+(?:\.\d+)?)b\b", low)
-        think = " Think" if re.search(r"\bthink\b", low) else ""
-        if size:
-            return f"Tri {size.group(1)}B{think}"
-        return f"Tri{think}".strip()
-
-    return name
-
-
-def extract_series_name(aa_name: str) -> str:
-    """Strip suffixes and collapse model variants into canonical series families."""
-    name = aa_name
-
-    # 1. Strip reasoning/effort modes
-    name = re.sub(
-        r"\s*\((Non-reasoning|Reasoning|Adaptive Reasoning|"
-        r"high|low|medium|minimal|xhigh|ChatGPT|experimental|preview|"
-        r"high effort|low effort)\)",
-        "", name, flags=re.IGNORECASE,
-    )
-
-    # 2. Strip date stamps in parens: (Feb '25), (Mar' 25), (June '24)
-    name = re.sub(r"\s*\([A-Za-z]{3,9}\s*'?\s*\d{2}\)", "", name)
-    # 2b. Strip numeric parenthetical stamps: (1210), (2025)
-    name = re.sub(r"\s*\(\d{4}\)", "", name)
-
-    # 3. Strip model size params: "235B A22B", "32B A3B", "8B", "1.7B", "0.6B"
-    name = re.sub(r"\s+\d+(\.\d+)?[Bb]\s+[Aa]\d+(\.\d+)?[Bb]", "", name)
-    name = re.sub(r"\s+[Aa]\d+(\.\d+)?[Bb]", "", name)
-    name = re.sub(r"\s+\d+(\.\d+)?[Bb]", "", name)
-
-    # 4. Strip trailing qualifier words
-    name = re.sub(
-        r"\s+(Instruct|Preview|Experimental|Thinking|Exp|Speciale)\s*$",
-        "", name, flags=re.IGNORECASE,
-    )
-
-    # 5. Strip trailing 4-digit date codes: 0905, 2507, 0528
-    name = re.sub(r"\s+\d{4}\s*$", "", name)
-
-    # 6. Normalize punctuation before family collapsing
-    name = re.sub(r"\s*-\s*", " ", name)
-    name = _normalize_spaces(name)
-
-    return _canonicalize_by_family(name)
-
-
-def make_slug(name: str) -> str:
-    """Convert display name to a URL-safe slug."""
-    slug = name.lower()
-    slug = re.sub(r"[^a-z0-9.]+", "-", slug)
-    return slug.strip("-")
-
-
-def normalize_for_match(name: str) -> str:
-    """Lowercase and strip all non-alphanumerics for fuzzy comparison."""
-    return re.sub(r"[^a-z0-9]", "", name.lower())
-
-
-def get_provider(series_name: str) -> str | None:
-    low = series_name.lower()
-    for prefix, provider in PROVIDER_PREFIXES.items():
-        if low.startswith(prefix):
-            return provider
-    return None
-
-
 # ── Phase 1: Seed model_series from model_snapshots ──────────────────────────
 
-def load_snapshots() -> list[dict]:
-    resp = requests.get(
-        f"{SUPABASE_URL}/rest/v1/model_snapshots",
-        headers=api_headers(),
-        params={"select": "aa_slug,aa_name,series_id", "limit": "10000"},
+def load_snapshots(unassigned_only: bool = False):
+    """Stream model_snapshots in aa_slug order, optionally only rows without series_id."""
+    filters = {"series_id": "is.null"} if unassigned_only else None
+    return stream_rows(
+        SUPABASE_URL, api_headers(), "model_snapshots", "aa_slug,aa_name,series_id", key="aa_slug", filters=filters
     )
-    resp.raise_for_status()
-    return resp.json()
 
 
 def load_all_series() -> list[dict]:
-    resp = requests.get(
-        f"{SUPABASE_URL}/rest/v1/model_series",
-        headers=api_headers(),
-        params={"select": "id,slug,display_name,query_aliases", "limit": "10000"},
-    )
-    resp.raise_for_status()
-    return resp.json()
+    return list(stream_rows(SUPABASE_URL, api_headers(), "model_series", "id,slug,display_name,query_aliases", key="id"))
 
 
-def upsert_series_batch(records: list[dict]) -> list[dict]:
+def upsert_series_batch(records: list[dict]) -> requests.Response:
     resp = requests.post(
         f"{SUPABASE_URL}/rest/v1/model_series",
         headers=api_headers("resolution=ignore-duplicates,return=representation"),
         json=records,
+        timeout=60,
     )
-    resp.raise_for_status()
-    return resp.json()
+    if resp.status_code != 413:
+        resp.raise_for_status()
+    return resp
 
 
-def seed_model_series(snapshots: list[dict], existing_slugs: set[str]) -> int:
-    """Derive unique series from snapshots and upsert any new ones."""
+def seed_model_series(snapshots, existing_slugs: set[str]) -> int:
+    """Derive unique series from snapshots (any iterable) and upsert any new ones."""
     # Collect unique (series_name, slug) pairs
     seen: dict[str, str] = {}  # slug -> display_name
+    loaded = 0
     for snap in snapshots:
+        loaded += 1
         series_name = extract_series_name(snap["aa_name"])
         if not series_name:
             continue
@@ -572,29 +263,53 @@ def seed_model_series(snapshots: list[dict], existing_slugs: set[str]) -> int:
         {
             "slug": slug,
             "display_name": name,
-            "provider": get_provider(name),
+            "provider": infer_provider(name),
             "query_aliases": [],
         }
         for slug, name in sorted(seen.items())
         if slug not in existing_slugs
     ]
+    print(f"  Loaded {loaded} model_snapshots")
 
     inserted = 0
-    for i in range(0, len(new_records), BATCH_SIZE):
-        batch = new_records[i : i + BATCH_SIZE]
-        result = upsert_series_batch(batch)
-        inserted += len(result)
+    batcher = AdaptiveBatcher(initial_rows=BATCH_SIZE, label="model_series")
+    for batch in batcher.split(new_records):
+        for resp in batcher.send(batch, upsert_series_batch):
+            inserted += len(resp.json())
 
     print(f"  model_series: {inserted} new rows inserted (of {len(new_records)} new slugs derived)")
     return inserted
 
 
-def build_series_lookup(all_series: list[dict]) -> dict[str, dict]:
+class SeriesLookup(dict):
+    """normalized_name -> series record, with a FuzzyIndex over its keys.
+
+    Keys added through item assignment (including series auto-created by
+    SeriesResolver) are indexed immediately. `by_slug` maps each slug to the
+    first series record seen with it, and `overrides` holds
+    QUERY_SLUG_OVERRIDES resolved to series records.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.fuzzy = FuzzyIndex(cutoff=0.80)
+        self.by_slug: dict[str, dict] = {}
+        self.overrides: dict[str, dict] = {}
+
+    def __setitem__(self, key: str, value: dict) -> None:
+        super().__setitem__(key, value)
+        self.fuzzy.add(key)
+        self.by_slug.setdefault(value["slug"], value)
+
+
+def build_series_lookup(all_series: list[dict]) -> SeriesLookup:
     """
-    Returns a dict: normalized_name -> series record.
+    Returns a SeriesLookup: normalized_name -> series record.
     Indexed by both display_name and all query_aliases.
     """
-    lookup: dict[str, dict] = {}
+    lookup = SeriesLookup()
+    for s in all_series:
+        lookup.by_slug.setdefault(s["slug"], s)
     for s in all_series:
         names = {s["display_name"], extract_series_name(s["display_name"])}
         for alias in (s.get("query_aliases") or []):
@@ -604,35 +319,36 @@ def build_series_lookup(all_series: list[dict]) -> dict[str, dict]:
             norm = normalize_for_match(name)
             if norm:
                 lookup[norm] = s
+
+    for query, slug in QUERY_SLUG_OVERRIDES.items():
+        series = lookup.by_slug.get(slug)
+        if series is not None:
+            lookup.overrides[query] = series
+        else:
+            print(f"    ⚠ Override slug '{slug}' for query '{query}' not found in DB — skipping override")
     return lookup
 
 
-def _resolve_override(query: str, all_series: list[dict]) -> dict | None:
+def _resolve_override(query: str, lookup: SeriesLookup) -> dict | None:
     """Check QUERY_SLUG_OVERRIDES first. Returns series record or None."""
-    slug = QUERY_SLUG_OVERRIDES.get(query.lower().strip())
-    if not slug:
-        return None
-    for s in all_series:
-        if s["slug"] == slug:
-            return s
-    print(f"    ⚠ Override slug '{slug}' for query '{query}' not found in DB — skipping override")
-    return None
+    key = query.lower().strip()
+    series = lookup.overrides.get(key)
+    if series is None and key in QUERY_SLUG_OVERRIDES:
+        # The slug may have been auto-created since the lookup was built.
+        series = lookup.by_slug.get(QUERY_SLUG_OVERRIDES[key])
+    return series
 
 
-def match_query_to_series(
-    query: str,
-    lookup: dict[str, dict],
-    all_series: list[dict],
-) -> dict | None:
+def match_query_to_series(query: str, lookup: SeriesLookup) -> dict | None:
     """
     Try to find a matching model_series for a raw CSV query string.
     0. Check QUERY_SLUG_OVERRIDES (explicit slug mapping)
     1. Exact normalized match
-    2. difflib fuzzy match (cutoff=0.80)
+    2. Indexed fuzzy match (difflib ratio, cutoff=0.80)
     Returns the series record or None.
     """
     # 0. Override table
-    override = _resolve_override(query, all_series)
+    override = _resolve_override(query, lookup)
     if override:
         return override
 
@@ -645,62 +361,184 @@ def match_query_to_series(
     if norm in lookup:
         return lookup[norm]
 
-    # 2. Fuzzy against all normalized keys
-    candidates = list(lookup.keys())
-    matches = get_close_matches(norm, candidates, n=1, cutoff=0.80)
-    if matches:
-        return lookup[matches[0]]
+    # 2. Fuzzy against all normalized keys (same result as difflib, cutoff=0.80)
+    match = lookup.fuzzy.best_match(norm)
+    if match:
+        return lookup[match]
 
     return None
 
 
-def get_or_create_series(
-    query: str,
-    lookup: dict[str, dict],
-    all_series: list[dict],
-) -> str | None:
-    """Return series_id for query, auto-creating a new series if needed."""
-    series = match_query_to_series(query, lookup, all_series)
-    if series:
-        return series["id"]
+def fetch_series_by_slugs(slugs: list[str]) -> list[dict]:
+    """Existing model_series rows for the given slugs (ignore-duplicates returns none for them)."""
+    found: list[dict] = []
+    for start in range(0, len(slugs), 100):
+        chunk = slugs[start:start + 100]
+        quoted = ",".join('"' + slug.replace('"', '\\"') + '"' for slug in chunk)
+        resp = requests.get(
+            f"{SUPABASE_URL}/rest/v1/model_series",
+            headers=api_headers(),
+            params={"select": "id,slug,display_name,query_aliases", "slug": f"in.({quoted})"},
+            timeout=60,
+        )
+        resp.raise_for_status()
+        found.extend(resp.json())
+    return found
+
+
+def create_series_bulk(pending: list[dict]) -> None:
+    """Insert pending series records in bulk and fill each one in place with its DB row."""
+    by_slug = {rec["slug"]: rec for rec in pending}
+    batcher = AdaptiveBatcher(initial_rows=BATCH_SIZE, label="model_series")
+    created: dict[str, dict] = {}
+    for batch in batcher.split(pending):
+        for resp in batcher.send(batch, upsert_series_batch):
+            for row in resp.json():
+                created[row["slug"]] = row
+
+    existing = [slug for slug in by_slug if slug not in created]
+    for row in fetch_series_by_slugs(existing) if existing else []:
+        created[row["slug"]] = row
+
+    for slug, rec in by_slug.items():
+        row = created.get(slug)
+        if row:
+            rec.update(row)
+        else:
+            print(f"    ⚠ Series '{slug}' was neither created nor found — rows keep series_id null")
 
-    # Auto-create
-    canonical_query = extract_series_name(query)
-    name_for_create = canonical_query or query
-    slug = make_slug(name_for_create)
-    print(
-        f"    ⚠ No match for query '{query}' — creating series "
-        f"'{name_for_create}' (slug: {slug})"
-    )
-    resp = requests.post(
-        f"{SUPABASE_URL}/rest/v1/model_series",
-        headers=api_headers("resolution=ignore-duplicates,return=representation"),
-        json=[{
-            "slug": slug,
-            "display_name": name_for_create,
-            "provider": get_provider(name_for_create),
-            "query_aliases": [query],
-        }],
+
+def resolution_key(query: str) -> str:
+    """
+    Cache key for a query: "override:<lowercased query>" for QUERY_SLUG_OVERRIDES
+    entries, otherwise the normalized series name match_query_to_series compares,
+    so spellings like "glm-5" / "GLM 5" share one entry.
+    """
+    lowered = query.lower().strip()
+    if lowered in QUERY_SLUG_OVERRIDES:
+        return f"override:{lowered}"
+    norm = normalize_for_match(extract_series_name(query) or query)
+    return norm or f"raw:{query}"
+
+
+class SeriesResolver:
+    """Resolve CSV queries to series once per resolution_key, queueing unmatched ones for bulk creation.
+
+    `resolve()` returns the series record for a query. A series that still
+    has to be created is returned as a placeholder without "id" and added to
+    the lookup right away, so later queries can match it just as they would
+    after a per-query insert. `flush()` creates every placeholder in one
+    bulk upsert and fills them in place with their DB rows.
+    """
+
+    def __init__(self, lookup: SeriesLookup, all_series: list[dict], cache: dict[str, str] | None = None):
+        self.lookup = lookup
+        self.all_series = all_series
+        self.cache = cache or {}
+        self.cache_hits = 0
+        self.by_id = {s["id"]: s for s in all_series}
+        self.resolved: dict[str, dict] = {}  # raw query -> series
+        self.by_key: dict[str, dict] = {}  # resolution_key -> series
+        self.pending: dict[str, dict] = {}  # slug -> record to create
+
+    def resolve(self, query: str) -> dict:
+        series = self.resolved.get(query)
+        if series is not None:
+            return series
+        key = resolution_key(query)
+        series = self.by_key.get(key)
+        if series is None:
+            series = self.by_key[key] = self._resolve_new(query, key)
+        self.resolved[query] = series
+        return series
+
+    def _resolve_new(self, query: str, key: str) -> dict:
+        series = self.by_id.get(self.cache.get(key))
+        if series is not None:
+            self.cache_hits += 1
+            return series
+        series = match_query_to_series(query, self.lookup)
+        if series is None:
+            canonical_query = extract_series_name(query)
+            name_for_create = canonical_query or query
+            slug = make_slug(name_for_create)
+            series = self.pending.get(slug)
+            if series is None:
+                print(
+                    f"    ⚠ No match for query '{query}' — creating series "
+                    f"'{name_for_create}' (slug: {slug})"
+                )
+                series = self.pending[slug] = {
+                    "slug": slug,
+                    "display_name": name_for_create,
+                    "provider": infer_provider(name_for_create),
+                    "query_aliases": [query],
+                }
+            # Later queries reuse it
+            for name in (query, name_for_create):
+                norm = normalize_for_match(name)
+                if norm:
+                    self.lookup[norm] = series
+        return series
+
+    def flush(self) -> None:
+        if not self.pending:
+            return
+        pending = list(self.pending.values())
+        self.pending = {}
+        create_series_bulk(pending)
+        # Slugs that already existed may be in all_series already.
+        created = [rec for rec in pending if rec.get("id") and rec["id"] not in self.by_id]
+        self.all_series.extend(created)
+        self.by_id.update((rec["id"], rec) for rec in created)
+
+    def resolutions(self) -> dict[str, str]:
+        """resolution_key -> series_id for every key resolved to a stored series."""
+        return {key: series["id"] for key, series in self.by_key.items() if series.get("id")}
+
+
+def series_fingerprint(all_series: list[dict]) -> str:
+    """Hash of everything a query match depends on: series rows, overrides and the naming rules."""
+    digest = hashlib.sha256()
+    rows = sorted(
+        (s["id"], s["slug"], s.get("display_name") or "", list(s.get("query_aliases") or [])) for s in all_series
     )
-    resp.raise_for_status()
-    data = resp.json()
-    if data:
-        new_series = data[0]
-        # Add to local structures so subsequent rows in same file reuse it
-        lookup[normalize_for_match(query)] = new_series
-        lookup[normalize_for_match(name_for_create)] = new_series
-        all_series.append(new_series)
-        return new_series["id"]
+    payload = [RESOLUTION_CACHE_VERSION, rows, sorted(QUERY_SLUG_OVERRIDES.items())]
+    digest.update(json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+    digest.update(Path(series_rules.__file__).read_bytes())
+    return digest.hexdigest()[:32]
 
-    return None
+
+def _resolution_cache_path() -> Path:
+    return SERIES_CACHE_DIR / f"query_series.v{RESOLUTION_CACHE_VERSION}.json"
+
+
+def load_resolution_cache(fingerprint: str) -> dict[str, str]:
+    """Cached resolution_key -> series_id matches, or {} when they were made against another fingerprint."""
+    try:
+        with _resolution_cache_path().open(encoding="utf-8") as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if cached.get("fingerprint") != fingerprint:
+        return {}
+    return cached.get("queries") or {}
+
+
+def save_resolution_cache(fingerprint: str, queries: dict[str, str]) -> None:
+    path = _resolution_cache_path()
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump({"fingerprint": fingerprint, "queries": queries}, f, ensure_ascii=False)
+        os.replace(tmp, path)
+    except OSError as e:
+        print(f"  resolution cache: could not save {path}: {e}")
 
 
-def update_snapshot_series_ids(
-    snapshots: list[dict],
-    lookup: dict[str, dict],
-    all_series: list[dict],
-) -> None:
-    """Patch model_snapshots.series_id for any snapshot that still has null."""
+def update_snapshot_series_ids(snapshots, lookup: SeriesLookup) -> None:
+    """Patch model_snapshots.series_id for any snapshot (any iterable) that still has null."""
     updates: list[tuple[str, str]] = []  # (aa_slug, series_id)
     for snap in snapshots:
         if snap.get("series_id"):
@@ -708,25 +546,15 @@ def update_snapshot_series_ids(
         series_name = extract_series_name(snap["aa_name"])
         if not series_name:
             continue
-        series = match_query_to_series(series_name, lookup, all_series)
+        series = match_query_to_series(series_name, lookup)
         if series:
             updates.append((snap["aa_slug"], series["id"]))
 
-    patched = 0
-    for aa_slug, series_id in updates:
-        resp = requests.patch(
-            f"{SUPABASE_URL}/rest/v1/model_snapshots",
-            headers=api_headers("return=minimal"),
-            params={"aa_slug": f"eq.{aa_slug}"},
-            json={"series_id": series_id},
-        )
-        resp.raise_for_status()
-        patched += 1
-
+    patched = bulk_set_snapshot_series(SUPABASE_URL, api_headers(), updates)
     print(f"  model_snapshots.series_id: {patched} rows updated")
 
 
-# ── Phase 2: Import social_posts from CSVs ────────────────────────────────────
+# ── Phase 2: Import social_posts + model_review_posts from CSVs ──────────────
 
 def parse_int(val: str, default: int = 0) -> int:
     try:
@@ -763,127 +591,168 @@ def parse_timestamp(val: str) -> str | None:
     return val if val else None
 
 
-def import_csv(
-    csv_path: Path,
-    lookup: dict[str, dict],
-    all_series: list[dict],
-) -> tuple[int, int]:
-    """Import one CSV file. Returns (inserted, skipped)."""
-    rows_to_insert: list[dict] = []
-    query_cache: dict[str, str | None] = {}
+def build_social_post_row(row: dict, series_id: str | None) -> dict:
+    """Map one CSV row (with a uid) to a social_posts record."""
+    query = row.get("query", "").strip()
+    return {
+        "uid": row.get("uid", "").strip(),
+        "series_id": series_id,
+        "platform": row.get("platform", "").strip() or None,
+        "query": query or None,
+        "post_date": parse_date(row.get("post_date", "")),
+        "source_url": row.get("source_url", "").strip() or None,
+        "title": row.get("title", "").strip() or None,
+        "author": row.get("author", "").strip() or None,
+        "like_count": parse_int(row.get("like_count", "0")),
+        "comment_count": parse_int(row.get("comment_count", "0")),
+        "collect_count": parse_int(row.get("collect_count", "0")),
+        "overall_score": parse_score(row.get("overall_score", "")),
+        "score_quality": parse_score(row.get("score_quality", "")),
+        "score_value": parse_score(row.get("score_value", "")),
+        "score_latency": parse_score(row.get("score_latency", "")),
+        "score_throughput": parse_score(row.get("score_throughput", "")),
+        "score_stability": parse_score(row.get("score_stability", "")),
+        "pros_summary": row.get("pros_summary", "").strip() or None,
+        "cons_summary": row.get("cons_summary", "").strip() or None,
+        "overall_summary": row.get("overall_summary", "").strip() or None,
+        "evidence": row.get("evidence", "").strip() or None,
+        "tag": row.get("tag", "").strip() or None,
+        "fetched_at": parse_timestamp(row.get("fetched_at", "")),
+        "run_id": row.get("run_id", "").strip() or None,
+    }
 
-    with open(csv_path, newline="", encoding="utf-8-sig") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            uid = row.get("uid", "").strip()
-            if not uid:
-                continue
 
-            query = row.get("query", "").strip()
-            if query not in query_cache:
-                query_cache[query] = get_or_create_series(query, lookup, all_series)
-            series_id = query_cache[query]
-
-            rows_to_insert.append({
-                "uid": uid,
-                "series_id": series_id,
-                "platform": row.get("platform", "").strip() or None,
-                "query": query or None,
-                "post_date": parse_date(row.get("post_date", "")),
-                "source_url": row.get("source_url", "").strip() or None,
-                "title": row.get("title", "").strip() or None,
-                "author": row.get("author", "").strip() or None,
-                "like_count": parse_int(row.get("like_count", "0")),
-                "comment_count": parse_int(row.get("comment_count", "0")),
-                "collect_count": parse_int(row.get("collect_count", "0")),
-                "overall_score": parse_score(row.get("overall_score", "")),
-                "score_quality": parse_score(row.get("score_quality", "")),
-                "score_value": parse_score(row.get("score_value", "")),
-                "score_latency": parse_score(row.get("score_latency", "")),
-                "score_throughput": parse_score(row.get("score_throughput", "")),
-                "score_stability": parse_score(row.get("score_stability", "")),
-                "pros_summary": row.get("pros_summary", "").strip() or None,
-                "cons_summary": row.get("cons_summary", "").strip() or None,
-                "overall_summary": row.get("overall_summary", "").strip() or None,
-                "evidence": row.get("evidence", "").strip() or None,
-                "tag": row.get("tag", "").strip() or None,
-                "fetched_at": parse_timestamp(row.get("fetched_at", "")),
-                "run_id": row.get("run_id", "").strip() or None,
-            })
-
-    if not rows_to_insert:
-        return 0, 0
+def load_known_uids() -> set[str]:
+    """Every uid already in social_posts, fetched once so re-imports can skip them client-side."""
+    return {row["uid"] for row in stream_rows(SUPABASE_URL, api_headers(), "social_posts", "uid", key="uid")}
+
+
+class SocialPostWriter:
+    """
+    `post(rows)` for the social_posts QueueUploader.
+    Sends each batch to the insert_social_posts RPC, which inserts with
+    ON CONFLICT (uid) DO NOTHING and answers only {"inserted", "skipped"}.
+    When the RPC is not deployed it falls back to the ignore-duplicates POST,
+    whose rows are counted as `unreported` (sent, outcome unknown).
+    A timed-out RPC may still have committed; AdaptiveBatcher resends its
+    rows split in two, and any it had inserted then come back as skipped, so
+    `timeouts` > 0 marks the inserted/skipped split as approximate.
+    Called from the uploader thread only.
+    """
+
+    def __init__(self):
+        self.use_rpc = True
+        self.inserted = 0
+        self.skipped = 0
+        self.unreported = 0
+        self.timeouts = 0
+
+    def __call__(self, batch: list[dict]) -> requests.Response:
+        if self.use_rpc:
+            try:
+                resp = requests.post(
+                    f"{SUPABASE_URL}/rest/v1/rpc/{SOCIAL_POSTS_RPC}",
+                    headers=api_headers(),
+                    json={"p_rows": batch},
+                    timeout=60,
+                )
+            except requests.Timeout:
+                self.timeouts += 1
+                raise
+            if not rpc_missing(resp):
+                self._check(resp, batch)
+                if resp.ok:
+                    counts = resp.json() or {}
+                    self.inserted += int(counts.get("inserted") or 0)
+                    self.skipped += int(counts.get("skipped") or 0)
+                return resp
+            print(f"  RPC {SOCIAL_POSTS_RPC} not found; falling back to ignore-duplicates inserts.")
+            self.use_rpc = False
 
-    inserted = 0
-    for i in range(0, len(rows_to_insert), BATCH_SIZE):
-        batch = rows_to_insert[i : i + BATCH_SIZE]
         resp = requests.post(
             f"{SUPABASE_URL}/rest/v1/social_posts",
             headers=api_headers("resolution=ignore-duplicates,return=minimal"),
             params={"on_conflict": "uid"},
             json=batch,
+            timeout=60,
         )
-        if resp.status_code not in (200, 201):
-            print(f"  ERROR batch {i//BATCH_SIZE + 1}: {resp.status_code} {resp.text[:200]}")
+        self._check(resp, batch)
+        if resp.ok:
+            self.unreported += len(batch)
+        return resp
+
+    @staticmethod
+    def _check(resp: requests.Response, batch: list[dict]) -> None:
+        if resp.status_code not in (200, 201, 413):
+            print(f"  ERROR batch ({len(batch)} rows): {resp.status_code} {resp.text[:200]}")
             resp.raise_for_status()
-        # Supabase returns 200 with empty body when all rows were ignored,
-        # 201 when rows were inserted. We can't easily distinguish without
-        # return=representation, so just count what we sent.
-        inserted += len(batch)
 
-    total = len(rows_to_insert)
-    return inserted, 0  # actual skips counted server-side via ignore-duplicates
 
+def post_review_posts(batch: list[dict]) -> requests.Response:
+    resp = requests.post(
+        f"{SUPABASE_URL}/rest/v1/model_review_posts",
+        headers=api_headers("resolution=ignore-duplicates,return=minimal"),
+        params={"on_conflict": "source_uid"},
+        json=batch,
+        timeout=60,
+    )
+    if resp.status_code not in (200, 201, 413):
+        print(f"  ERROR batch ({len(batch)} rows): {resp.status_code} {resp.text[:300]}")
+        resp.raise_for_status()
+    return resp
 
-# ── Phase 3: Publish to model_review_posts ───────────────────────────────────
 
-def import_csv_to_review_posts(
+def import_csv(
     csv_path: Path,
-    lookup: dict[str, dict],
-    all_series: list[dict],
-) -> tuple[int, int]:
+    resolver: SeriesResolver,
+    social_sink: QueueUploader,
+    review_sink: QueueUploader,
+    known_uids: set[str],
+) -> tuple[int, int, int, int]:
     """
-    Read one CSV and upsert rows into model_review_posts.
-    Dedup is handled server-side via unique index on source_uid.
-    Returns (sent, skipped_no_score).
+    Read one CSV once and queue its rows for social_posts and model_review_posts.
+    Rows whose series is still being created wait until the file's bulk
+    insert. social_posts rows whose uid is in `known_uids` are not queued, and
+    queued uids are added to it; remaining dedup is server-side (uid / source_uid).
+    Returns (social rows queued, social rows already known, review rows queued,
+    review rows skipped).
     """
-    rows_to_insert: list[dict] = []
-    query_cache: dict[str, str | None] = {}
-    skipped = 0
+    social = known = review = skipped = 0
+    deferred: list[tuple[dict, dict]] = []
+
+    def emit(row: dict, series: dict) -> None:
+        nonlocal social, known, review, skipped
+        series_id = series.get("id")
+        uid = row["uid"].strip()
+        if uid in known_uids:
+            known += 1
+        else:
+            known_uids.add(uid)
+            social_sink.put(build_social_post_row(row, series_id))
+            social += 1
+        record = build_review_post_row(row, series_id)
+        if record is None:
+            skipped += 1
+        else:
+            review_sink.put(record)
+            review += 1
 
     with open(csv_path, newline="", encoding="utf-8-sig") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            query = (row.get("query") or "").strip()
-            if query not in query_cache:
-                series = match_query_to_series(query, lookup, all_series)
-                query_cache[query] = series["id"] if series else None
-            series_id = query_cache[query]
-
-            record = build_review_post_row(row, series_id)
-            if record is None:
+        for row in csv.DictReader(f):
+            if not row.get("uid", "").strip():
+                # No uid: neither a social post nor a publishable review.
                 skipped += 1
                 continue
-            rows_to_insert.append(record)
+            series = resolver.resolve(row.get("query", "").strip())
+            if "id" in series:
+                emit(row, series)
+            else:
+                deferred.append((row, series))
 
-    if not rows_to_insert:
-        return 0, skipped
-
-    sent = 0
-    for i in range(0, len(rows_to_insert), BATCH_SIZE):
-        batch = rows_to_insert[i : i + BATCH_SIZE]
-        resp = requests.post(
-            f"{SUPABASE_URL}/rest/v1/model_review_posts",
-            headers=api_headers("resolution=ignore-duplicates,return=minimal"),
-            params={"on_conflict": "source_uid"},
-            json=batch,
-        )
-        if resp.status_code not in (200, 201):
-            print(f"  ERROR batch {i // BATCH_SIZE + 1}: {resp.status_code} {resp.text[:300]}")
-            resp.raise_for_status()
-        sent += len(batch)
-
-    return sent, skipped
+    resolver.flush()
+    for row, series in deferred:
+        emit(row, series)
+    return social, known, review, skipped
 
 
 # ── Main ──────────────────────────────────────────────────────────────────────
@@ -913,14 +782,11 @@ def main() -> None:
     # ── Phase 1 ──────────────────────────────────────────────────────────────
     print("\n── Phase 1: Seeding model_series ────────────────────────────────")
 
-    snapshots = load_snapshots()
-    print(f"  Loaded {len(snapshots)} model_snapshots")
-
     existing_series = load_all_series()
     existing_slugs = {s["slug"] for s in existing_series}
     print(f"  Existing model_series: {len(existing_series)}")
 
-    seed_model_series(snapshots, existing_slugs)
+    seed_model_series(load_snapshots(), existing_slugs)
 
     # Reload after insert
     all_series = load_all_series()
@@ -928,34 +794,56 @@ def main() -> None:
     print(f"  Total model_series after seed: {len(all_series)}")
 
     print("\n  Updating model_snapshots.series_id …")
-    update_snapshot_series_ids(snapshots, lookup, all_series)
+    update_snapshot_series_ids(load_snapshots(unassigned_only=True), lookup)
 
     # ── Phase 2 ──────────────────────────────────────────────────────────────
-    print("\n── Phase 2: Importing social_posts ──────────────────────────────")
-
-    total_sent = 0
+    print("\n── Phase 2: Importing social_posts + model_review_posts ─────────")
+
+    fingerprint = series_fingerprint(all_series)
+    cache = load_resolution_cache(fingerprint)
+    print(f"  Query resolution cache: {len(cache)} entries for this model_series state")
+    resolver = SeriesResolver(lookup, all_series, cache)
+    known_uids = load_known_uids()
+    print(f"  Known social_posts uids: {len(known_uids)}")
+    social_writer = SocialPostWriter()
+    social_sink = QueueUploader(social_writer, "social_posts", initial_rows=BATCH_SIZE)
+    review_sink = QueueUploader(post_review_posts, "model_review_posts", initial_rows=BATCH_SIZE)
+    total_known = total_review_skipped = 0
     for csv_path in csv_files:
         print(f"\n  {csv_path.name}")
-        sent, _ = import_csv(csv_path, lookup, all_series)
-        print(f"    → {sent} rows sent (duplicates silently skipped by DB)")
-        total_sent += sent
-
-    print(f"\n✓ Phase 2 done — {total_sent} rows sent across {len(csv_files)} file(s)")
-
-    # ── Phase 3 ──────────────────────────────────────────────────────────────
-    print("\n── Phase 3: Publishing to model_review_posts ────────────────────")
-
-    total_review_sent = 0
-    total_review_skipped = 0
-    for csv_path in csv_files:
-        print(f"\n  {csv_path.name}")
-        sent, skipped = import_csv_to_review_posts(csv_path, lookup, all_series)
-        print(f"    → {sent} rows sent, {skipped} skipped (missing overall score)")
-        total_review_sent += sent
+        social, known, review, skipped = import_csv(csv_path, resolver, social_sink, review_sink, known_uids)
+        print(
+            f"    → {social} social_posts rows queued ({known} already known), {review} review rows queued, "
+            f"{skipped} skipped for review (missing uid, series or overall score)"
+        )
+        total_known += known
         total_review_skipped += skipped
 
+    total_sent = social_sink.close()
+    total_review_sent = review_sink.close()
+
+    # Entries stay valid only for the table they were matched against; creating
+    # series changes the fingerprint, so earlier entries are not carried over.
+    resolutions = resolver.resolutions()
+    final_fingerprint = series_fingerprint(all_series)
+    if final_fingerprint == fingerprint:
+        resolutions = {**cache, **resolutions}
+    save_resolution_cache(final_fingerprint, resolutions)
+    print(f"  Query resolution cache: {resolver.cache_hits} hits, {len(resolutions)} entries saved")
+    print(f"  social_posts write stats: {social_sink.batcher.summary()}")
+    print(f"  model_review_posts write stats: {review_sink.batcher.summary()}")
+
+    social_result = f"{social_writer.inserted} inserted, {social_writer.skipped} duplicates skipped by DB"
+    if social_writer.unreported:
+        social_result += f", {social_writer.unreported} sent without counts ({SOCIAL_POSTS_RPC} not deployed)"
+    if social_writer.timeouts:
+        social_result += (
+            f"; approximate: {social_writer.timeouts} timed-out RPC batch(es) were resent, "
+            "rows they had already inserted are counted as skipped"
+        )
     print(
-        f"\n✓ Done — Phase 3: {total_review_sent} review rows sent, "
+        f"\n✓ Done — {total_sent} social_posts rows sent across {len(csv_files)} file(s) "
+        f"({social_result}; {total_known} already known, not sent); {total_review_sent} review rows sent, "
         f"{total_review_skipped} skipped"
     )
 
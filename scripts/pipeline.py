@@ -8,28 +8,66 @@ Required env vars:
   AA_API_KEY
   SUPABASE_URL
   SUPABASE_SERVICE_ROLE_KEY
+
+Offline record/replay:
+  PIPELINE_RECORD_FIXTURES=path.json.gz   save the fetched AA/OR payloads after a live fetch
+  PIPELINE_REPLAY_FIXTURES=path.json.gz   skip the fetch and replay a saved bundle; without
+                                          SUPABASE_URL, writes go to an in-memory PostgREST
+                                          stub (scripts/postgrest_stub.py)
+  PIPELINE_STUB_LATENCY_MS=N              per-request latency of that stub
+
+Instrumentation:
+  Every run writes a JSON report (phase timings, bytes, retries) to
+  Comment/pipeline_run_report.json (override dir with PIPELINE_REPORT_DIR).
+  PIPELINE_PROFILE=cprofile|pyinstrument  also dump a profile next to it
 """
 
 import datetime
+import gzip
+import hashlib
+import itertools
 import json
 import os
 import re
 import sys
 import subprocess
+import threading
+import time
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 
+from aa_categories import category_elo_index, category_entries, normalize_category_label
+from alias_index import load_alias_index, lookup_aliases_many
+from run_report import RunReport, default_report_dir, profiled
+from supabase_io import AdaptiveBatcher, run_batches, stream_rows
+
 AA_API_KEY = os.environ.get("AA_API_KEY", "")
 AA_API_BASE_URL = "https://artificialanalysis.ai/api/v2/data"
 OR_API_URL = "https://openrouter.ai/api/v1/models"
 SUPABASE_URL = os.environ.get("SUPABASE_URL", "").rstrip("/")
 SERVICE_ROLE_KEY = os.environ.get("SUPABASE_SERVICE_ROLE_KEY", "")
 REQUEST_TIMEOUT = 30
+# Initial rows per write batch; AdaptiveBatcher resizes from payload bytes and latency.
 BATCH_SIZE = 50
+# Six AA endpoints + OpenRouter are fetched in parallel over one pooled session.
+FETCH_WORKERS = int(os.environ.get("PIPELINE_FETCH_WORKERS", "7"))
+# Number of upsert batches kept in flight against PostgREST.
+UPSERT_WORKERS = int(os.environ.get("PIPELINE_UPSERT_WORKERS", "4"))
+CACHE_DIR = Path(
+    os.environ.get("PIPELINE_CACHE_DIR") or Path(__file__).resolve().parent.parent / ".cache" / "pipeline"
+)
+MANIFEST_PATH = CACHE_DIR / "model_snapshots_manifest.json"
+MANIFEST_VERSION = 1
+FIXTURE_VERSION = 1
+REPORT_DIR = default_report_dir()
+REPORT = RunReport("pipeline")
+# Columns that change every run without the record itself changing.
+HASH_IGNORED_COLUMNS = {"record_date"}
 
 AA_ENDPOINTS = {
     "llm": "llms/models",
@@ -71,7 +109,11 @@ MISSING_COLUMN_PATTERNS = [
 ]
 
 
-def build_session():
+def env_flag(name):
+    return os.environ.get(name, "").strip().lower() in {"1", "true", "yes", "on"}
+
+
+def build_session(pool_size=FETCH_WORKERS):
     session = requests.Session()
     retry = Retry(
         total=3,
@@ -81,56 +123,24 @@ def build_session():
         status_forcelist=(429, 500, 502, 503, 504),
         allowed_methods=("GET",),
     )
-    session.mount("https://", HTTPAdapter(max_retries=retry))
+    # pool_block keeps concurrent fetches within the bounded connection pool.
+    adapter = HTTPAdapter(
+        max_retries=retry,
+        pool_connections=2,
+        pool_maxsize=max(1, pool_size),
+        pool_block=True,
+    )
+    session.mount("https://", adapter)
     return session
 
 
-def normalize_name(name):
-    if not isinstance(name, str):
-        return ""
-    text = name.lower().strip()
-    text = text.replace("gpt-4o", "gpt4o").replace("gpt-4-omni", "gpt4o")
-    text = re.sub(r"[\s_]+", "-", text)
-    text = re.sub(r"[^a-z0-9\-/]", "", text)
-    return text.strip("-/")
-
-
-def strip_provider_prefix(text):
-    if not isinstance(text, str):
-        return ""
-    return re.sub(r"^[^:]{1,40}:\s*", "", text).strip()
-
-
-def remove_date_noise(text):
-    if not isinstance(text, str):
-        return ""
-    t = text.lower()
-    t = re.sub(r"\([^)]*\)", " ", t)
-    t = re.sub(r"\b(19|20)\d{2}\b", " ", t)
-    t = re.sub(r"\b\d{8}\b|\b\d{6}\b|\b\d{4}\b", " ", t)
-    t = re.sub(r"\b(?:jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)[a-z]*[-\s']?\d{2,4}\b", " ", t)
-    t = re.sub(r"\b(?:preview|latest|stable|release|experimental|exp)\b", " ", t)
-    return re.sub(r"\s+", " ", t).strip()
-
-
-def model_core_key(value):
-    if not isinstance(value, str):
-        return ""
-    text = strip_provider_prefix(value)
-    text = remove_date_noise(text)
-    text = normalize_name(text)
-    text = re.sub(r"(?:[-_/](?:free|beta|alpha|chat|instruct|latest))+$", "", text)
-    return re.sub(r"-{2,}", "-", text).strip("-/")
-
-
-def make_aliases(slug: str, name: str, canonical: str = ""):
-    candidates = [slug, name, strip_provider_prefix(name), canonical]
-    aliases = set()
-    for c in candidates:
-        aliases.add(normalize_name(c))
-        aliases.add(model_core_key(c))
-    aliases.discard("")
-    return aliases
+def build_write_session(pool_size=UPSERT_WORKERS):
+    """Keep-alive session for Supabase writes (no urllib3 retries on POST)."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, pool_size), pool_block=True)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
 
 
 def is_cn_provider(creator_name: str) -> bool:
@@ -156,93 +166,131 @@ def fetch_aa_data(session, endpoint: str):
     params = {}
     if endpoint in {"media/text-to-image", "media/text-to-video", "media/image-to-video"}:
         params["include_categories"] = "true"
-    try:
-        resp = session.get(url, headers={"x-api-key": AA_API_KEY}, params=params, timeout=REQUEST_TIMEOUT)
-        resp.raise_for_status()
-        records = resp.json().get("data", [])
-        print(f"AA {endpoint}: {len(records)}")
-        return records
-    except Exception as e:
-        print(f"AA fetch error {endpoint}: {e}", file=sys.stderr)
-        return []
+    with REPORT.phase(f"fetch {endpoint}") as phase:
+        try:
+            resp = session.get(url, headers={"x-api-key": AA_API_KEY}, params=params, timeout=REQUEST_TIMEOUT)
+            REPORT.track_response(resp)
+            resp.raise_for_status()
+            records = resp.json().get("data", [])
+            phase["records"] = len(records)
+            print(f"AA {endpoint}: {len(records)} ({phase.elapsed():.2f}s)")
+            return records
+        except Exception as e:
+            phase["error"] = str(e)
+            print(f"AA fetch error {endpoint} after {phase.elapsed():.2f}s: {e}", file=sys.stderr)
+            return []
 
 
 def fetch_or_data(session):
-    try:
-        resp = session.get(OR_API_URL, timeout=REQUEST_TIMEOUT)
-        resp.raise_for_status()
-        records = resp.json().get("data", [])
-        print(f"OR models: {len(records)}")
-        return records
-    except Exception as e:
-        print(f"OR fetch error: {e}", file=sys.stderr)
-        return []
+    with REPORT.phase("fetch openrouter") as phase:
+        try:
+            resp = session.get(OR_API_URL, timeout=REQUEST_TIMEOUT)
+            REPORT.track_response(resp)
+            resp.raise_for_status()
+            records = resp.json().get("data", [])
+            phase["records"] = len(records)
+            print(f"OR models: {len(records)} ({phase.elapsed():.2f}s)")
+            return records
+        except Exception as e:
+            phase["error"] = str(e)
+            print(f"OR fetch error after {phase.elapsed():.2f}s: {e}", file=sys.stderr)
+            return []
+
+
+def fetch_all(session):
+    """Fetch every AA endpoint and OpenRouter concurrently.
+
+    Each fetcher already swallows its own errors and returns an empty list,
+    so a failing endpoint never cancels the others.
+    """
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, FETCH_WORKERS), thread_name_prefix="fetch") as pool:
+        aa_futures = {
+            name: pool.submit(fetch_aa_data, session, endpoint)
+            for name, endpoint in AA_ENDPOINTS.items()
+        }
+        or_future = pool.submit(fetch_or_data, session)
+        aa_data = {name: future.result() for name, future in aa_futures.items()}
+        or_data = or_future.result()
+    print(f"Fetch stage done in {time.perf_counter() - started:.2f}s")
+    return aa_data, or_data
+
+
+def save_fixtures(path, aa_data, or_data):
+    """Write fetched upstream payloads into a gzip JSON fixture bundle."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    bundle = {
+        "version": FIXTURE_VERSION,
+        "recorded_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "aa": aa_data,
+        "or": or_data,
+    }
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        json.dump(bundle, f, ensure_ascii=False)
+    print(f"Recorded fixtures: {path}")
+
+
+def load_fixtures(path):
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        bundle = json.load(f)
+    if bundle.get("version") != FIXTURE_VERSION:
+        raise ValueError(f"Unsupported fixture bundle version in {path}: {bundle.get('version')}")
+    aa_data = {name: bundle["aa"].get(name, []) for name in AA_ENDPOINTS}
+    print(
+        f"Replaying fixtures {path} (recorded {bundle.get('recorded_at')}): "
+        + ", ".join(f"{name}={len(records)}" for name, records in aa_data.items())
+        + f", or={len(bundle['or'])}"
+    )
+    return aa_data, bundle["or"]
 
 
 def build_or_context_map(or_records):
-    out = {}
-    for rec in or_records:
-        model_id = rec.get("id") or ""
-        model_name = rec.get("name") or ""
-        canonical = rec.get("canonical_slug") or ""
-        context = rec.get("context_length")
-        modalities = (rec.get("architecture") or {}).get("input_modalities")
-        aliases = make_aliases(model_id, model_name, canonical)
-        for a in aliases:
-            if a not in out:
-                out[a] = {
-                    "context_length": context,
-                    "input_modalities": modalities,
-                }
-    return out
-
-
-def match_or(aa_slug: str, aa_name: str, or_map):
-    primary = normalize_name(aa_slug)
-    if primary in or_map:
-        return or_map[primary]
-    for a in make_aliases(aa_slug, aa_name):
-        if a in or_map:
-            return or_map[a]
-    return {"context_length": None, "input_modalities": None}
-
-
-def get_category_elo(categories, style=None, subject=None, fmt=None):
-    def norm(text):
-        if not isinstance(text, str):
-            return ""
-        t = text.strip().lower()
-        t = t.replace("&", "and")
-        t = re.sub(r"\s+", " ", t)
-        return t
-
-    style_norm = norm(style)
-    subject_norm = norm(subject)
-    fmt_norm = norm(fmt)
-
-    for item in categories or []:
-        item_style = norm(item.get("style_category") or "")
-        item_subject = norm(item.get("subject_matter_category") or "")
-        item_format = norm(item.get("format_category") or "")
-        if style_norm and item_style == style_norm:
-            return item.get("elo")
-        if subject_norm and item_subject == subject_norm:
-            return item.get("elo")
-        if fmt_norm and item_format == fmt_norm:
-            return item.get("elo")
-    return None
+    """Alias -> OR context, loaded from the persisted alias index when the OR payload is unchanged."""
+    return load_alias_index(or_records)
+
+
+NO_OR_MATCH = {"context_length": None, "input_modalities": None}
+
+
+def match_or_many(llm_records, or_map):
+    """OR entry per AA record (NO_OR_MATCH when unmatched), normalizing names column-wise."""
+    slugs = [rec.get("slug") or "" for rec in llm_records]
+    names = [rec.get("name") or "" for rec in llm_records]
+    return [entry or NO_OR_MATCH for entry in lookup_aliases_many(or_map, slugs, names)]
+
+
+# Media category columns: column -> (axis, AA category label). Labels are compared after
+# normalize_category_label, so "Cartoon & Illustration" matches "cartoon and illustration".
+MEDIA_CATEGORY_COLUMNS = {
+    "category_style_anime_elo": ("style", "Anime"),
+    "category_style_cartoon_illustration_elo": ("style", "Cartoon & Illustration"),
+    "category_style_general_photorealistic_elo": ("style", "General & Photorealistic"),
+    "category_style_graphic_design_digital_rendering_elo": ("style", "Graphic Design & Digital Rendering"),
+    "category_style_traditional_art_elo": ("style", "Traditional Art"),
+    "category_subject_commercial_elo": ("subject", "Commercial"),
+    "category_format_short_prompt_elo": ("format", "Short Prompt"),
+    "category_format_long_prompt_elo": ("format", "Long Prompt"),
+    "category_format_moving_camera_elo": ("format", "Moving Camera"),
+    "category_format_multi_scene_elo": ("format", "Multi-Scene"),
+    "category_style_photorealistic_elo": ("style", "Photorealistic"),
+    "category_style_cartoon_and_anime_elo": ("style", "Cartoon and Anime"),
+    "category_style_3d_animation_elo": ("style", "3D Animation"),
+}
+_MEDIA_CATEGORY_KEYS = [
+    (column, (axis, normalize_category_label(label))) for column, (axis, label) in MEDIA_CATEGORY_COLUMNS.items()
+]
 
 
 def build_llm_rows(llm_records, or_map):
     rows = []
     today = datetime.date.today().isoformat()
-    for rec in llm_records:
+    for rec, or_match in zip(llm_records, match_or_many(llm_records, or_map)):
         evals = rec.get("evaluations") or {}
         pricing = rec.get("pricing") or {}
         creator = rec.get("model_creator") or {}
         creator_name = (creator.get("name") or "").strip()
         cn = is_cn_provider(creator_name)
-        or_match = match_or(rec.get("slug") or "", rec.get("name") or "", or_map)
 
         rows.append({
             "aa_slug": rec.get("slug") or "",
@@ -288,7 +336,7 @@ def build_media_rows(records, modality):
         creator = rec.get("model_creator") or {}
         creator_name = (creator.get("name") or "").strip()
         cn = is_cn_provider(creator_name)
-        categories = rec.get("categories") or []
+        elo_by_label = category_elo_index(category_entries(rec.get("categories") or []))
 
         source_slug = rec.get("slug") or ""
         row = {
@@ -308,22 +356,9 @@ def build_media_rows(records, modality):
             "has_or": False,
             "match_confidence": None,
             "record_date": today,
-
-            "category_style_anime_elo": get_category_elo(categories, style="Anime"),
-            "category_style_cartoon_illustration_elo": get_category_elo(categories, style="Cartoon & Illustration"),
-            "category_style_general_photorealistic_elo": get_category_elo(categories, style="General & Photorealistic"),
-            "category_style_graphic_design_digital_rendering_elo": get_category_elo(categories, style="Graphic Design & Digital Rendering"),
-            "category_style_traditional_art_elo": get_category_elo(categories, style="Traditional Art"),
-            "category_subject_commercial_elo": get_category_elo(categories, subject="Commercial"),
-
-            "category_format_short_prompt_elo": get_category_elo(categories, fmt="Short Prompt"),
-            "category_format_long_prompt_elo": get_category_elo(categories, fmt="Long Prompt"),
-            "category_format_moving_camera_elo": get_category_elo(categories, fmt="Moving Camera"),
-            "category_format_multi_scene_elo": get_category_elo(categories, fmt="Multi-Scene"),
-            "category_style_photorealistic_elo": get_category_elo(categories, style="Photorealistic"),
-            "category_style_cartoon_and_anime_elo": get_category_elo(categories, style="Cartoon and Anime"),
-            "category_style_3d_animation_elo": get_category_elo(categories, style="3D Animation"),
         }
+        for column, key in _MEDIA_CATEGORY_KEYS:
+            row[column] = elo_by_label.get(key)
         rows.append(row)
     return rows
 
@@ -351,7 +386,7 @@ def log_media_coverage(rows, modality):
     print(f"{modality} coverage: " + ", ".join(stats))
 
 
-def upsert_batch(records):
+def upsert_batch(records, session=None):
     if not SUPABASE_URL or not SERVICE_ROLE_KEY:
         raise RuntimeError("SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY must be set.")
     url = f"{SUPABASE_URL}/rest/v1/model_snapshots"
@@ -361,7 +396,8 @@ def upsert_batch(records):
         "Content-Type": "application/json",
         "Prefer": "resolution=merge-duplicates,return=minimal",
     }
-    resp = requests.post(url, headers=headers, json=records, timeout=60)
+    resp = (session or requests).post(url, headers=headers, json=records, timeout=60)
+    REPORT.track_response(resp)
     return resp
 
 
@@ -373,6 +409,7 @@ def call_rpc(function_name, payload=None):
         "Content-Type": "application/json",
     }
     resp = requests.post(url, headers=headers, json=(payload or {}), timeout=60)
+    REPORT.track_response(resp)
     return resp
 
 
@@ -407,103 +444,340 @@ def normalize_record_keys(records):
     return normalized
 
 
-def upsert_all(records):
+def _hashable_value(value):
+    # PostgREST returns numeric/integer columns as JSON numbers; compare 1 and 1.0 equal.
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, (int, float)):
+        return float(value)
+    return value
+
+
+def row_hash(row, keys=None):
+    """Content hash of a prepared snapshot row, ignoring HASH_IGNORED_COLUMNS."""
+    keys = row.keys() if keys is None else keys
+    payload = {k: _hashable_value(row.get(k)) for k in keys if k not in HASH_IGNORED_COLUMNS}
+    text = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+
+def load_manifest(path=MANIFEST_PATH):
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data.get("version") != MANIFEST_VERSION:
+        return None
+    return data.get("rows") or {}
+
+
+def save_manifest(rows, path=MANIFEST_PATH):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "version": MANIFEST_VERSION,
+                "generated_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                "rows": {r["aa_slug"]: row_hash(r) for r in rows},
+            },
+            f,
+        )
+    os.replace(tmp, path)
+
+
+def fetch_db_manifest(rows, page_size=1000):
+    """Rebuild the manifest from model_snapshots, hashing only the columns we write."""
+    keys_by_slug = {r["aa_slug"]: list(r.keys()) for r in rows}
+    headers = {"apikey": SERVICE_ROLE_KEY, "Authorization": f"Bearer {SERVICE_ROLE_KEY}"}
+    manifest = {}
+    for db_row in stream_rows(
+        SUPABASE_URL,
+        headers,
+        "model_snapshots",
+        "*",
+        key="aa_slug",
+        page_size=page_size,
+        on_response=REPORT.track_response,
+    ):
+        slug = db_row.get("aa_slug")
+        # Rows we no longer produce only need to exist in the manifest.
+        manifest[slug] = row_hash(db_row, keys_by_slug.get(slug, ()))
+    return manifest
+
+
+def fetch_db_slugs(page_size=1000):
+    """Every aa_slug currently in model_snapshots (slug column only)."""
+    headers = {"apikey": SERVICE_ROLE_KEY, "Authorization": f"Bearer {SERVICE_ROLE_KEY}"}
+    return {
+        row["aa_slug"]
+        for row in stream_rows(
+            SUPABASE_URL,
+            headers,
+            "model_snapshots",
+            "aa_slug",
+            key="aa_slug",
+            page_size=page_size,
+            on_response=REPORT.track_response,
+        )
+    }
+
+
+def refresh_record_dates(slugs, record_date, chunk_size=100):
+    """Set record_date on rows the incremental diff skipped, one PATCH per chunk of slugs.
+
+    Rows already at `record_date` are left alone (record_date=lt.), and rows we
+    no longer produce are never touched, matching what a full upsert would do.
+    """
+    headers = {
+        "apikey": SERVICE_ROLE_KEY,
+        "Authorization": f"Bearer {SERVICE_ROLE_KEY}",
+        "Content-Type": "application/json",
+        "Prefer": "return=minimal",
+    }
+    session = requests.Session()
+    for start in range(0, len(slugs), chunk_size):
+        chunk = slugs[start:start + chunk_size]
+        quoted = ",".join('"' + slug.replace('"', '\\"') + '"' for slug in chunk)
+        resp = session.patch(
+            f"{SUPABASE_URL}/rest/v1/model_snapshots",
+            headers=headers,
+            params={"aa_slug": f"in.({quoted})", "record_date": f"lt.{record_date}"},
+            json={"record_date": record_date},
+            timeout=60,
+        )
+        REPORT.track_response(resp)
+        if not resp.ok:
+            print(f"record_date refresh ERROR {resp.status_code}: {resp.text[:400]}", file=sys.stderr)
+            resp.raise_for_status()
+
+
+def diff_against_manifest(rows, manifest):
+    """Return (rows to send, counts) comparing prepared rows with a previous manifest."""
+    to_send = []
+    counts = {"inserted": 0, "changed": 0, "unchanged": 0, "removed": 0}
+    seen = set()
+    for row in rows:
+        slug = row["aa_slug"]
+        seen.add(slug)
+        previous = manifest.get(slug)
+        if previous is None:
+            counts["inserted"] += 1
+            to_send.append(row)
+        elif previous != row_hash(row):
+            counts["changed"] += 1
+            to_send.append(row)
+        else:
+            counts["unchanged"] += 1
+    counts["removed"] = sum(1 for slug in manifest if slug not in seen)
+    return to_send, counts
+
+
+def upsert_all(records, workers=UPSERT_WORKERS):
+    """Upsert rows in adaptive batches with up to `workers` batches in flight.
+
+    Batches start at BATCH_SIZE rows and are resized by AdaptiveBatcher from
+    payload bytes and latency. Schema drift is shared across workers: once
+    PostgREST reports a missing column, every later attempt (including
+    retries of in-flight batches) drops it.
+    """
     total = len(records)
+    workers = max(1, workers)
     ignored_columns = set()
-    for i in range(0, total, BATCH_SIZE):
-        batch = records[i:i + BATCH_SIZE]
-        batch_num = i // BATCH_SIZE + 1
-        attempt = 0
+    drift_lock = threading.Lock()
+    session = build_write_session(workers)
+    batcher = AdaptiveBatcher(initial_rows=BATCH_SIZE, label="model_snapshots")
+    batch_numbers = itertools.count(1)
 
+    def post(batch):
+        batch_num = next(batch_numbers)
+        attempt = 0
         while True:
             attempt += 1
-            batch_payload = prune_columns(batch, ignored_columns)
+            with drift_lock:
+                ignored = set(ignored_columns)
+            batch_payload = prune_columns(batch, ignored)
             batch_payload = normalize_record_keys(batch_payload)
             print(f"Upserting batch {batch_num} ({len(batch_payload)} rows), attempt {attempt}")
-            resp = upsert_batch(batch_payload)
+            resp = upsert_batch(batch_payload, session)
 
-            if resp.ok:
-                break
+            # 413 goes back to the batcher, which splits the batch.
+            if resp.ok or resp.status_code == 413:
+                return resp
 
             text = resp.text or ""
             missing = extract_missing_columns(text)
-            newly_missing = missing - ignored_columns
-            if newly_missing:
+            with drift_lock:
+                newly_missing = missing - ignored_columns
                 ignored_columns.update(newly_missing)
+            if missing - ignored:
+                REPORT.incr("schema_drift_retries")
+            if newly_missing:
                 print(
                     f"Schema drift detected; dropping missing columns and retrying: {sorted(newly_missing)}",
                     file=sys.stderr,
                 )
+            # Retry when the column was unknown to this attempt, even if a
+            # concurrent batch recorded it first.
+            if missing - ignored:
                 continue
 
             print(f"Upsert ERROR {resp.status_code}: {text[:400]}", file=sys.stderr)
             resp.raise_for_status()
 
+    started = time.perf_counter()
+    run_batches(batcher.split(records), lambda batch: batcher.send(batch, post), workers)
+    wall = time.perf_counter() - started
+
     if ignored_columns:
         print(f"Upsert completed with schema fallback. Ignored columns: {sorted(ignored_columns)}")
+    rate = total / wall if wall > 0 else 0.0
+    print(f"Upsert stats: {workers} workers, {wall:.2f}s, {rate:.1f} rows/s; {batcher.summary()}")
+    REPORT.incr("upsert_requests", len(batcher.latencies))
+    REPORT.incr("upsert_batch_shrinks", batcher.shrinks)
+    REPORT.meta["ignored_columns"] = sorted(ignored_columns)
     print(f"Done. {total} rows upserted.")
 
 
-def main():
-    if not AA_API_KEY:
+def run_pipeline():
+    global SUPABASE_URL, SERVICE_ROLE_KEY
+
+    replay_path = os.environ.get("PIPELINE_REPLAY_FIXTURES", "").strip()
+    record_path = os.environ.get("PIPELINE_RECORD_FIXTURES", "").strip()
+    stub = None
+    if replay_path and not SUPABASE_URL:
+        from postgrest_stub import start_stub
+
+        stub = start_stub(latency_ms=float(os.environ.get("PIPELINE_STUB_LATENCY_MS", "0") or 0))
+        SUPABASE_URL, SERVICE_ROLE_KEY = stub.url, "stub"
+        print(f"Using local PostgREST stub at {stub.url}")
+    REPORT.meta["mode"] = "replay" if replay_path else "live"
+
+    if not AA_API_KEY and not replay_path:
         print("ERROR: AA_API_KEY must be set.", file=sys.stderr)
         sys.exit(1)
     if not SUPABASE_URL or not SERVICE_ROLE_KEY:
         print("ERROR: SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY must be set.", file=sys.stderr)
         sys.exit(1)
 
-    session = build_session()
-    aa_data = {name: fetch_aa_data(session, ep) for name, ep in AA_ENDPOINTS.items()}
-    or_data = fetch_or_data(session)
+    with REPORT.phase("fetch"):
+        if replay_path:
+            aa_data, or_data = load_fixtures(replay_path)
+        else:
+            session = build_session()
+            aa_data, or_data = fetch_all(session)
+            if record_path:
+                save_fixtures(record_path, aa_data, or_data)
 
     if not aa_data["llm"]:
         print("No AA LLM data fetched; aborting.", file=sys.stderr)
         sys.exit(1)
 
-    or_map = build_or_context_map(or_data)
-
-    all_rows = []
-    all_rows.extend(build_llm_rows(aa_data["llm"], or_map))
-    all_rows.extend(build_media_rows(aa_data["text_to_image"], "text_to_image"))
-    all_rows.extend(build_media_rows(aa_data["image_editing"], "image_editing"))
-    all_rows.extend(build_media_rows(aa_data["text_to_speech"], "text_to_speech"))
-    all_rows.extend(build_media_rows(aa_data["text_to_video"], "text_to_video"))
-    all_rows.extend(build_media_rows(aa_data["image_to_video"], "image_to_video"))
-
-    # Emit visibility for category coverage to catch upstream schema/category-label drift.
-    log_media_coverage([r for r in all_rows if r.get("aa_modality") == "text_to_video"], "text_to_video")
-    log_media_coverage([r for r in all_rows if r.get("aa_modality") == "image_to_video"], "image_to_video")
-
-    # Skip rows without slug; slug is PK.
-    all_rows = [r for r in all_rows if r.get("aa_slug")]
+    with REPORT.phase("build or_map") as phase:
+        or_map = build_or_context_map(or_data)
+        phase["aliases"] = len(or_map)
+
+    with REPORT.phase("build rows") as phase:
+        all_rows = []
+        all_rows.extend(build_llm_rows(aa_data["llm"], or_map))
+        all_rows.extend(build_media_rows(aa_data["text_to_image"], "text_to_image"))
+        all_rows.extend(build_media_rows(aa_data["image_editing"], "image_editing"))
+        all_rows.extend(build_media_rows(aa_data["text_to_speech"], "text_to_speech"))
+        all_rows.extend(build_media_rows(aa_data["text_to_video"], "text_to_video"))
+        all_rows.extend(build_media_rows(aa_data["image_to_video"], "image_to_video"))
+
+        # Emit visibility for category coverage to catch upstream schema/category-label drift.
+        log_media_coverage([r for r in all_rows if r.get("aa_modality") == "text_to_video"], "text_to_video")
+        log_media_coverage([r for r in all_rows if r.get("aa_modality") == "image_to_video"], "image_to_video")
+
+        # Skip rows without slug; slug is PK.
+        all_rows = [r for r in all_rows if r.get("aa_slug")]
+        phase["rows"] = len(all_rows)
     print(f"Total rows prepared: {len(all_rows)}")
 
-    upsert_all(all_rows)
-
-    # Keep product->provider model coverage in sync with latest daily snapshot data.
-    refresh_resp = call_rpc("refresh_product_supported_models")
-    if refresh_resp.ok:
-        print(f"refresh_product_supported_models OK: {refresh_resp.text[:200]}")
-    else:
+    # Incremental mode upserts only new/changed rows; record_date is not part of
+    # the hash and is refreshed for the unchanged rows after the upsert.
+    incremental = env_flag("PIPELINE_INCREMENTAL")
+    rows_to_upsert = all_rows
+    if incremental:
+        with REPORT.phase("incremental diff") as phase:
+            manifest = None
+            if os.environ.get("PIPELINE_MANIFEST_SOURCE", "").strip().lower() != "db":
+                manifest = load_manifest()
+            if manifest is None:
+                print("Incremental: building manifest from model_snapshots")
+                manifest = fetch_db_manifest(all_rows)
+            else:
+                print(f"Incremental: loaded manifest {MANIFEST_PATH} ({len(manifest)} rows)")
+                # Rows deleted outside the pipeline (e.g. seed_from_csv) must be re-sent
+                # even though their hash is unchanged, so treat them as inserts.
+                db_slugs = fetch_db_slugs()
+                missing = [slug for slug in manifest if slug not in db_slugs]
+                for slug in missing:
+                    del manifest[slug]
+                phase["missing_in_db"] = len(missing)
+                if missing:
+                    print(f"Incremental: {len(missing)} manifest rows missing from model_snapshots; re-sending")
+            rows_to_upsert, counts = diff_against_manifest(all_rows, manifest)
+            phase.fields.update(counts)
         print(
-            f"refresh_product_supported_models ERROR {refresh_resp.status_code}: {refresh_resp.text[:400]}",
-            file=sys.stderr,
+            f"Incremental: {counts['inserted']} inserted, {counts['changed']} changed, "
+            f"{counts['unchanged']} unchanged, {counts['removed']} removed upstream"
         )
-        refresh_resp.raise_for_status()
 
-    run_series_sync = os.environ.get("RUN_MODEL_SERIES_SYNC", "").strip().lower() in {
-        "1", "true", "yes", "on",
-    }
-    series_sync_dry_run = os.environ.get("RUN_MODEL_SERIES_SYNC_DRY_RUN", "").strip().lower() in {
-        "1", "true", "yes", "on",
-    }
-    if run_series_sync:
+    with REPORT.phase("upsert") as phase:
+        phase["rows"] = len(rows_to_upsert)
+        upsert_all(rows_to_upsert)
+
+    if incremental:
+        with REPORT.phase("refresh record_date") as phase:
+            sent = {r["aa_slug"] for r in rows_to_upsert}
+            unchanged = [r["aa_slug"] for r in all_rows if r["aa_slug"] not in sent]
+            record_date = datetime.date.today().isoformat()
+            phase["rows"] = len(unchanged)
+            refresh_record_dates(unchanged, record_date)
+        print(f"Incremental: record_date set to {record_date} on {len(unchanged)} unchanged rows")
+
+    # Keep product->provider model coverage in sync with latest daily snapshot data.
+    with REPORT.phase("rpc refresh_product_supported_models"):
+        refresh_resp = call_rpc("refresh_product_supported_models")
+        if refresh_resp.ok:
+            print(f"refresh_product_supported_models OK: {refresh_resp.text[:200]}")
+        else:
+            print(
+                f"refresh_product_supported_models ERROR {refresh_resp.status_code}: {refresh_resp.text[:400]}",
+                file=sys.stderr,
+            )
+            refresh_resp.raise_for_status()
+
+    if incremental:
+        save_manifest(all_rows)
+        print(f"Incremental: manifest saved to {MANIFEST_PATH}")
+
+    run_series_sync = env_flag("RUN_MODEL_SERIES_SYNC")
+    series_sync_dry_run = env_flag("RUN_MODEL_SERIES_SYNC_DRY_RUN")
+    if run_series_sync and stub is not None:
+        print("Skipping model series sync against the local PostgREST stub.")
+    elif run_series_sync:
         sync_script = Path(__file__).with_name("sync_model_series_all_modalities.py")
         cmd = [sys.executable, str(sync_script)]
         if series_sync_dry_run:
             cmd.append("--dry-run")
         print(f"Running model series sync: {' '.join(cmd)}")
-        subprocess.run(cmd, check=True)
+        with REPORT.phase("series sync subprocess"):
+            subprocess.run(cmd, check=True)
+
+
+def main():
+    status = "error"
+    try:
+        with profiled(os.environ.get("PIPELINE_PROFILE", ""), REPORT_DIR, "pipeline_profile"):
+            run_pipeline()
+        status = "ok"
+    finally:
+        REPORT.meta["status"] = status
+        REPORT.write(REPORT_DIR / "pipeline_run_report.json")
 
 
 if __name__ == "__main__":
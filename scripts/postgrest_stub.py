@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+postgrest_stub.py  –  In-memory stand-in for the Supabase PostgREST endpoints
+used by the data scripts, for offline replay and benchmarking.
+
+Supports the subset the scripts rely on:
+  POST   /rest/v1/<table>        upsert (Prefer: resolution=merge-duplicates|ignore-duplicates,
+                                 return=minimal|representation); bulk rows must share keys (PGRST102)
+  GET    /rest/v1/<table>        select=, order=<col>.asc|desc, limit=, offset=,
+                                 <col>=eq.|neq.|gt.|lt.|is.null|in.(...) filters, or=(<col>.<op>.<value>,...)
+  PATCH  /rest/v1/<table>        with the same filters
+  DELETE /rest/v1/<table>        with the same filters
+  POST   /rest/v1/rpc/<name>     bulk_set_snapshot_series and insert_social_posts are applied;
+                                 other functions return 0, --missing-rpcs answer 404 PGRST202
+
+Usage:
+    python scripts/postgrest_stub.py --port 54321 [--latency-ms 40] [--missing-columns a,b] [--missing-rpcs f]
+    SUPABASE_URL=http://127.0.0.1:54321 SUPABASE_SERVICE_ROLE_KEY=stub python scripts/...
+"""
+
+import argparse
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+PRIMARY_KEYS = {
+    "model_snapshots": "aa_slug",
+    "model_series": "slug",
+    "social_posts": "uid",
+    "model_review_posts": "source_uid",
+}
+RESERVED_PARAMS = {"select", "order", "limit", "offset", "on_conflict"}
+
+
+class PostgrestStub(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency_ms: float = 0, missing_columns=(), missing_rpcs=()):
+        super().__init__(address, _Handler)
+        self.tables: dict[str, dict] = {}
+        self.latency = latency_ms / 1000.0
+        self.missing_columns = set(missing_columns)
+        self.missing_rpcs = set(missing_rpcs)
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def rows(self, table: str) -> list[dict]:
+        with self.lock:
+            return list(self.tables.get(table, {}).values())
+
+
+def _matches(row: dict, filters: list[tuple[str, str]]) -> bool:
+    for col, expr in filters:
+        if col == "or":
+            alternatives = [tuple(part.split(".", 1)) for part in expr.strip("()").split(",") if "." in part]
+            if not any(_matches(row, [alt]) for alt in alternatives):
+                return False
+            continue
+        op, _, value = expr.partition(".")
+        current = row.get(col)
+        if op == "is" and value == "null":
+            ok = current is None
+        elif op == "eq":
+            ok = current is not None and str(current) == value
+        elif op == "neq":
+            ok = current is None or str(current) != value
+        elif op == "in":
+            options = {v.strip().strip('"').replace('\\"', '"') for v in value.strip("()").split(",")}
+            ok = current is not None and str(current) in options
+        elif op == "gt":
+            ok = current is not None and str(current) > value
+        elif op == "lt":
+            ok = current is not None and str(current) < value
+        else:
+            ok = True
+        if not ok:
+            return False
+    return True
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: PostgrestStub
+
+    def log_message(self, *args):
+        pass
+
+    def _route(self):
+        parts = urlsplit(self.path)
+        params = parse_qsl(parts.query, keep_blank_values=True)
+        name = parts.path.rsplit("/", 1)[-1]
+        filters = [(k, v) for k, v in params if k not in RESERVED_PARAMS]
+        return parts.path, name, dict(params), filters
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"null")
+
+    def _reply(self, status: int, payload=None):
+        body = b"" if payload is None else json.dumps(payload, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _begin(self):
+        with self.server.lock:
+            self.server.requests += 1
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+    def do_POST(self):
+        self._begin()
+        path, name, params, _ = self._route()
+        payload = self._body()
+        if "/rpc/" in path:
+            if name in self.server.missing_rpcs:
+                self._reply(404, {
+                    "code": "PGRST202",
+                    "message": f"Could not find the function public.{name} in the schema cache",
+                })
+                return
+            self._reply(200, self._rpc(name, payload or {}))
+            return
+
+        rows = payload if isinstance(payload, list) else [payload]
+        if any(set(row) != set(rows[0]) for row in rows):
+            self._reply(400, {"code": "PGRST102", "message": "All object keys must match"})
+            return
+        for row in rows:
+            bad = sorted(self.server.missing_columns & set(row))
+            if bad:
+                self._reply(400, {
+                    "code": "PGRST204",
+                    "message": f"Could not find the '{bad[0]}' column of '{name}' in the schema cache",
+                })
+                return
+
+        prefer = self.headers.get("Prefer", "")
+        pk = params.get("on_conflict") or PRIMARY_KEYS.get(name, "id")
+        written = []
+        with self.server.lock:
+            table = self.server.tables.setdefault(name, {})
+            for row in rows:
+                key = row.get(pk)
+                if key in table and "ignore-duplicates" in prefer:
+                    continue
+                merged = dict(table.get(key) or {"id": str(uuid.uuid4())})
+                merged.update(row)
+                table[merged.get(pk, merged["id"])] = merged
+                written.append(dict(merged))
+        if "return=representation" in prefer:
+            self._reply(201, written)
+        else:
+            self._reply(201)
+
+    def _rpc(self, name: str, args: dict):
+        if name == "insert_social_posts":
+            return self._insert_social_posts(args.get("p_rows") or [])
+        if name != "bulk_set_snapshot_series":
+            return 0
+        changed = 0
+        with self.server.lock:
+            snapshots = self.server.tables.get("model_snapshots", {})
+            for update in args.get("p_updates") or []:
+                row = snapshots.get(update.get("aa_slug"))
+                if row is not None and row.get("series_id") != update.get("series_id"):
+                    row["series_id"] = update.get("series_id")
+                    changed += 1
+        return changed
+
+    def _insert_social_posts(self, rows: list[dict]) -> dict:
+        inserted = 0
+        with self.server.lock:
+            table = self.server.tables.setdefault("social_posts", {})
+            for row in rows:
+                if row.get("uid") in table:
+                    continue
+                table[row.get("uid")] = {"id": str(uuid.uuid4()), **row}
+                inserted += 1
+        return {"inserted": inserted, "skipped": len(rows) - inserted}
+
+    def do_GET(self):
+        self._begin()
+        _, name, params, filters = self._route()
+        select = params.get("select", "*")
+        unknown = sorted(self.server.missing_columns & {c.strip() for c in select.split(",")})
+        if unknown:
+            self._reply(400, {"code": "42703", "message": f"column {name}.{unknown[0]} does not exist"})
+            return
+        rows = [r for r in self.server.rows(name) if _matches(r, filters)]
+        order = params.get("order")
+        if order:
+            col, _, direction = order.partition(".")
+            rows.sort(key=lambda r: (r.get(col) is None, str(r.get(col))), reverse=direction.startswith("desc"))
+        offset = int(params.get("offset") or 0)
+        limit = params.get("limit")
+        rows = rows[offset:offset + int(limit)] if limit else rows[offset:]
+        if select != "*":
+            cols = [c.strip() for c in select.split(",")]
+            rows = [{c: r.get(c) for c in cols} for r in rows]
+        self._reply(200, rows)
+
+    def do_PATCH(self):
+        self._begin()
+        _, name, _, filters = self._route()
+        changes = self._body() or {}
+        with self.server.lock:
+            for row in self.server.tables.get(name, {}).values():
+                if _matches(row, filters):
+                    row.update(changes)
+        self._reply(204)
+
+    def do_DELETE(self):
+        self._begin()
+        _, name, _, filters = self._route()
+        with self.server.lock:
+            table = self.server.tables.get(name, {})
+            for key in [k for k, r in table.items() if _matches(r, filters)]:
+                del table[key]
+        self._reply(204)
+
+
+def start_stub(port: int = 0, latency_ms: float = 0, missing_columns=(), missing_rpcs=()) -> PostgrestStub:
+    """Start the stub on a background thread and return the server."""
+    server = PostgrestStub(
+        ("127.0.0.1", port), latency_ms=latency_ms, missing_columns=missing_columns, missing_rpcs=missing_rpcs
+    )
+    threading.Thread(target=server.serve_forever, name="postgrest-stub", daemon=True).start()
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run an in-memory PostgREST stand-in.")
+    parser.add_argument("--port", type=int, default=54321)
+    parser.add_argument("--latency-ms", type=float, default=0, help="Artificial latency per request.")
+    parser.add_argument(
+        "--missing-columns",
+        default="",
+        help="Comma-separated columns to reject, to exercise schema-drift handling.",
+    )
+    parser.add_argument(
+        "--missing-rpcs",
+        default="",
+        help="Comma-separated functions to report as not deployed, to exercise RPC fallbacks.",
+    )
+    args = parser.parse_args()
+    missing = [c.strip() for c in args.missing_columns.split(",") if c.strip()]
+    missing_rpcs = [f.strip() for f in args.missing_rpcs.split(",") if f.strip()]
+    server = PostgrestStub(
+        ("127.0.0.1", args.port), latency_ms=args.latency_ms, missing_columns=missing, missing_rpcs=missing_rpcs
+    )
+    print(f"PostgREST stub listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""Phase timing, counters and optional profiling for the data scripts.
+
+A RunReport collects timed phases and integer counters (thread-safe) and is
+written as JSON at the end of a run. `profiled()` wraps a run in cProfile or
+pyinstrument when requested.
+"""
+
+import cProfile
+import datetime
+import json
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+
+
+class Phase:
+    def __init__(self, name: str):
+        self.name = name
+        self.fields: dict = {}
+        self.started = time.perf_counter()
+        self.seconds = None
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started if self.seconds is None else self.seconds
+
+    def __setitem__(self, key, value):
+        self.fields[key] = value
+
+
+class RunReport:
+    def __init__(self, name: str):
+        self.name = name
+        self.started_at = datetime.datetime.now(datetime.timezone.utc)
+        self.phases: list[dict] = []
+        self.counters: dict[str, int] = defaultdict(int)
+        self.meta: dict = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name: str):
+        """Time a block; assign `phase[key] = value` inside it to attach details."""
+        phase = Phase(name)
+        status = "ok"
+        try:
+            yield phase
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            phase.seconds = time.perf_counter() - phase.started
+            if "error" in phase.fields:
+                status = "error"
+            with self._lock:
+                self.phases.append({"name": name, "seconds": round(phase.seconds, 4), "status": status, **phase.fields})
+
+    def incr(self, counter: str, amount: int = 1) -> None:
+        with self._lock:
+            self.counters[counter] += amount
+
+    def track_response(self, resp) -> None:
+        """Count request/response bytes and urllib3 retries for a requests.Response."""
+        body = getattr(resp.request, "body", None) or b""
+        self.incr("bytes_sent", len(body.encode("utf-8") if isinstance(body, str) else body))
+        self.incr("bytes_received", len(resp.content or b""))
+        retries = getattr(getattr(resp, "raw", None), "retries", None)
+        history = getattr(retries, "history", None) or ()
+        if history:
+            self.incr("http_retries", len(history))
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "name": self.name,
+                "started_at": self.started_at.isoformat(),
+                "finished_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                "total_seconds": round((datetime.datetime.now(datetime.timezone.utc) - self.started_at).total_seconds(), 4),
+                **self.meta,
+                "phases": list(self.phases),
+                "counters": dict(sorted(self.counters.items())),
+            }
+
+    def write(self, path: Path) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+        print(f"Run report: {path}")
+
+
+@contextmanager
+def profiled(mode: str, out_dir: Path, stem: str):
+    """Profile the enclosed block with `cprofile` or `pyinstrument`; no-op otherwise."""
+    mode = (mode or "").strip().lower()
+    out_dir = Path(out_dir)
+    if mode in {"cprofile", "1", "true", "on"}:
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            out_dir.mkdir(parents=True, exist_ok=True)
+            out = out_dir / f"{stem}.prof"
+            profiler.dump_stats(out)
+            print(f"cProfile stats: {out} (view with: python -m pstats {out})")
+        return
+
+    if mode == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            print("pyinstrument is not installed; running without profiling.", file=sys.stderr)
+            yield
+            return
+        profiler = Profiler()
+        profiler.start()
+        try:
+            yield
+        finally:
+            profiler.stop()
+            out_dir.mkdir(parents=True, exist_ok=True)
+            out = out_dir / f"{stem}.html"
+            out.write_text(profiler.output_html(), encoding="utf-8")
+            print(f"pyinstrument report: {out}")
+        return
+
+    if mode:
+        print(f"Unknown profile mode {mode!r}; expected cprofile or pyinstrument.", file=sys.stderr)
+    yield
+
+
+def default_report_dir() -> Path:
+    return Path(os.environ.get("PIPELINE_REPORT_DIR") or Path(__file__).resolve().parent.parent / "Comment")
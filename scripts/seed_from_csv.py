@@ -10,19 +10,34 @@ Inputs (generated by docs/python/fetch_aa_split_local.py):
 - docs/python/aa_split_outputs/aa_text_to_speech_raw.csv
 - docs/python/aa_split_outputs/aa_text_to_video_raw.csv
 - docs/python/aa_split_outputs/aa_image_to_video_raw.csv
+
+Rows are parsed and uploaded as a stream: CSV rows are read lazily and
+batches are posted by SEED_UPSERT_WORKERS threads while the next batch is
+being parsed. Every row is tagged with this run's load_generation; once all
+groups are upserted, non-LLM rows of older generations are deleted in one
+statement, so the media catalog is never empty mid-load. Without the
+load_generation column (migration not applied) the script falls back to
+deleting non-LLM rows up front.
 """
 
 import csv
-import json
+import datetime
+import itertools
 import os
 import sys
 from pathlib import Path
 
 import requests
+from requests.adapters import HTTPAdapter
+
+from supabase_io import AdaptiveBatcher, run_batches
 
 SUPABASE_URL = os.environ.get("SUPABASE_URL", "").rstrip("/")
 SERVICE_ROLE_KEY = os.environ.get("SUPABASE_SERVICE_ROLE_KEY", "")
+# Initial rows per write batch; AdaptiveBatcher resizes from payload bytes and latency.
 BATCH_SIZE = 50
+# Number of upsert batches kept in flight while the next ones are parsed.
+UPSERT_WORKERS = int(os.environ.get("SEED_UPSERT_WORKERS", "4"))
 
 BASE_DIR = Path(__file__).parent.parent / "docs" / "python" / "aa_split_outputs"
 LLM_CSV = BASE_DIR / "aa_llm_models_processed_current.csv"
@@ -87,90 +102,106 @@ def is_cn_provider(creator_name: str) -> bool:
     return any(k in lower for k in CN_PROVIDERS)
 
 
-def upsert_batch(records):
+def api_headers(**extra):
+    return {"apikey": SERVICE_ROLE_KEY, "Authorization": f"Bearer {SERVICE_ROLE_KEY}", **extra}
+
+
+def build_write_session(pool_size=UPSERT_WORKERS):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, pool_size), pool_block=True)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def upsert_batch(records, session=None):
     if not SUPABASE_URL or not SERVICE_ROLE_KEY:
         raise RuntimeError("SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY env vars must be set.")
     url = f"{SUPABASE_URL}/rest/v1/model_snapshots"
-    headers = {
-        "apikey": SERVICE_ROLE_KEY,
-        "Authorization": f"Bearer {SERVICE_ROLE_KEY}",
+    headers = api_headers(**{
         "Content-Type": "application/json",
         "Prefer": "resolution=merge-duplicates,return=minimal",
-    }
-    resp = requests.post(url, headers=headers, json=records, timeout=60)
-    if not resp.ok:
+    })
+    resp = (session or requests).post(url, headers=headers, json=records, timeout=60)
+    # 413 is left to AdaptiveBatcher, which retries with smaller batches.
+    if not resp.ok and resp.status_code != 413:
         print(f"ERROR {resp.status_code}: {resp.text[:400]}", file=sys.stderr)
         resp.raise_for_status()
+    return resp
+
+
+def has_generation_column():
+    """Whether model_snapshots.load_generation exists (PostgREST rejects unknown select columns)."""
+    resp = requests.get(
+        f"{SUPABASE_URL}/rest/v1/model_snapshots",
+        headers=api_headers(),
+        params={"select": "load_generation", "limit": "1"},
+        timeout=60,
+    )
+    if resp.ok:
+        return True
+    if resp.status_code == 400:
+        return False
+    print(f"PROBE ERROR {resp.status_code}: {resp.text[:400]}", file=sys.stderr)
+    resp.raise_for_status()
 
 
-def delete_non_llm_rows():
+def delete_non_llm_rows(keep_generation=None):
+    """Delete non-LLM rows; with `keep_generation`, only those not tagged with it."""
     if not SUPABASE_URL or not SERVICE_ROLE_KEY:
         raise RuntimeError("SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY env vars must be set.")
     url = f"{SUPABASE_URL}/rest/v1/model_snapshots"
-    headers = {
-        "apikey": SERVICE_ROLE_KEY,
-        "Authorization": f"Bearer {SERVICE_ROLE_KEY}",
-        "Prefer": "return=minimal",
-    }
-    resp = requests.delete(url, headers=headers, params={"aa_modality": "neq.llm"}, timeout=60)
+    params = {"aa_modality": "neq.llm"}
+    if keep_generation:
+        params["or"] = f"(load_generation.is.null,load_generation.neq.{keep_generation})"
+    resp = requests.delete(url, headers=api_headers(Prefer="return=minimal"), params=params, timeout=60)
     if not resp.ok:
         print(f"DELETE ERROR {resp.status_code}: {resp.text[:400]}", file=sys.stderr)
         resp.raise_for_status()
 
 
-def load_llm_records():
-    if not LLM_CSV.exists():
-        raise FileNotFoundError(f"Missing CSV: {LLM_CSV}")
-
-    out = []
+def iter_llm_records():
     with open(LLM_CSV, newline="", encoding="utf-8") as f:
         for row in csv.DictReader(f):
             slug = (row.get("aa_slug") or "").strip()
             if not slug:
                 continue
-            out.append(
-                {
-                    "aa_id": None,
-                    "aa_model_creator_id": None,
-                    "aa_slug": slug,
-                    "aa_name": (row.get("aa_name") or "").strip(),
-                    "aa_modality": "llm",
-                    "aa_model_creator_name": (row.get("aa_model_creator_name") or "").strip() or None,
-                    "aa_model_creator_name_cn": (
-                        (row.get("aa_model_creator_name_CN") or "").strip()
-                        or CN_NAME_MAP.get((row.get("aa_model_creator_name") or "").strip())
-                    ),
-                    "is_cn_provider": safe_bool(row.get("is_cn_provider")) or is_cn_provider((row.get("aa_model_creator_name") or "").strip()),
-                    "reasoning_type": (row.get("reasoning_type") or "").strip() or None,
-                    "aa_intelligence_index": safe_float(row.get("aa_intelligence_index")),
-                    "aa_coding_index": safe_float(row.get("aa_coding_index")),
-                    "aa_gpqa": safe_float(row.get("aa_gpqa")),
-                    "aa_hle": safe_float(row.get("aa_hle")),
-                    "aa_ifbench": safe_float(row.get("aa_ifbench")),
-                    "aa_lcr": safe_float(row.get("aa_lcr")),
-                    "aa_scicode": safe_float(row.get("aa_scicode")),
-                    "aa_terminalbench_hard": safe_float(row.get("aa_terminalbench_hard")),
-                    "aa_tau2": safe_float(row.get("aa_tau2")),
-                    "aa_ttft_seconds": safe_float(row.get("aa_ttft_seconds")),
-                    "aa_tps": safe_float(row.get("aa_tps")),
-                    "aa_price_input_usd": safe_float(row.get("aa_price_input_usd")),
-                    "aa_price_output_usd": safe_float(row.get("aa_price_output_usd")),
-                    "aa_price_blended_usd": safe_float(row.get("aa_price_blended_usd")),
-                    "aa_context_length": safe_int(row.get("aa_context_length")),
-                    "aa_release_date": (row.get("aa_release_date") or "").strip() or None,
-                    "has_aa": True,
-                    "has_or": safe_int(row.get("aa_context_length")) is not None,
-                    "record_date": (row.get("record_date") or "").strip() or None,
-                }
-            )
-    return out
-
-
-def load_media_records(modality, path):
-    if not path.exists():
-        raise FileNotFoundError(f"Missing CSV: {path}")
-
-    out = []
+            yield {
+                "aa_id": None,
+                "aa_model_creator_id": None,
+                "aa_slug": slug,
+                "aa_name": (row.get("aa_name") or "").strip(),
+                "aa_modality": "llm",
+                "aa_model_creator_name": (row.get("aa_model_creator_name") or "").strip() or None,
+                "aa_model_creator_name_cn": (
+                    (row.get("aa_model_creator_name_CN") or "").strip()
+                    or CN_NAME_MAP.get((row.get("aa_model_creator_name") or "").strip())
+                ),
+                "is_cn_provider": safe_bool(row.get("is_cn_provider")) or is_cn_provider((row.get("aa_model_creator_name") or "").strip()),
+                "reasoning_type": (row.get("reasoning_type") or "").strip() or None,
+                "aa_intelligence_index": safe_float(row.get("aa_intelligence_index")),
+                "aa_coding_index": safe_float(row.get("aa_coding_index")),
+                "aa_gpqa": safe_float(row.get("aa_gpqa")),
+                "aa_hle": safe_float(row.get("aa_hle")),
+                "aa_ifbench": safe_float(row.get("aa_ifbench")),
+                "aa_lcr": safe_float(row.get("aa_lcr")),
+                "aa_scicode": safe_float(row.get("aa_scicode")),
+                "aa_terminalbench_hard": safe_float(row.get("aa_terminalbench_hard")),
+                "aa_tau2": safe_float(row.get("aa_tau2")),
+                "aa_ttft_seconds": safe_float(row.get("aa_ttft_seconds")),
+                "aa_tps": safe_float(row.get("aa_tps")),
+                "aa_price_input_usd": safe_float(row.get("aa_price_input_usd")),
+                "aa_price_output_usd": safe_float(row.get("aa_price_output_usd")),
+                "aa_price_blended_usd": safe_float(row.get("aa_price_blended_usd")),
+                "aa_context_length": safe_int(row.get("aa_context_length")),
+                "aa_release_date": (row.get("aa_release_date") or "").strip() or None,
+                "has_aa": True,
+                "has_or": safe_int(row.get("aa_context_length")) is not None,
+                "record_date": (row.get("record_date") or "").strip() or None,
+            }
+
+
+def iter_media_records(modality, path):
     with open(path, newline="", encoding="utf-8") as f:
         for row in csv.DictReader(f):
             source_slug = (row.get("slug") or "").strip()
@@ -209,8 +240,17 @@ def load_media_records(modality, path):
                 "category_style_cartoon_and_anime_elo": safe_float(row.get("category_style_cartoon_and_anime_elo")),
                 "category_style_3d_animation_elo": safe_float(row.get("category_style_3d_animation_elo")),
             }
-            out.append(record)
-    return out
+            yield record
+
+
+def iter_groups():
+    yield "llm", iter_llm_records()
+    for modality, path in MEDIA_FILES.items():
+        yield modality, iter_media_records(modality, path)
+
+
+def new_generation():
+    return datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
 
 
 def main():
@@ -218,27 +258,53 @@ def main():
         print("ERROR: SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY must be set.", file=sys.stderr)
         sys.exit(1)
 
-    groups = []
-    llm_records = load_llm_records()
-    groups.append(("llm", llm_records))
-    for modality, path in MEDIA_FILES.items():
-        groups.append((modality, load_media_records(modality, path)))
-
-    total = sum(len(records) for _, records in groups)
-    print(f"Loaded {total} rows from aa_split_outputs CSVs.")
-
-    # Reset non-LLM rows to prevent stale/overlapping data before reinsert.
-    print("Deleting existing non-LLM rows...")
-    delete_non_llm_rows()
-
-    for group_name, records in groups:
-        print(f"Upserting group: {group_name} ({len(records)} rows)")
-        for i in range(0, len(records), BATCH_SIZE):
-            batch = records[i:i + BATCH_SIZE]
-            print(f"  batch {i // BATCH_SIZE + 1} ({len(batch)} rows)...")
-            upsert_batch(batch)
+    # Fail before writing anything when an input is missing.
+    for path in [LLM_CSV, *MEDIA_FILES.values()]:
+        if not path.exists():
+            raise FileNotFoundError(f"Missing CSV: {path}")
+
+    generation = new_generation() if has_generation_column() else None
+    if generation:
+        print(f"Load generation: {generation}")
+    else:
+        # Legacy schema: reset non-LLM rows to prevent stale/overlapping data before reinsert.
+        print("model_snapshots.load_generation not found; deleting existing non-LLM rows first...")
+        delete_non_llm_rows()
+
+    counts = {}
+
+    def tagged_rows(group_name, records):
+        counts[group_name] = 0
+        for record in records:
+            counts[group_name] += 1
+            if generation:
+                record["load_generation"] = generation
+            yield record
+
+    workers = max(1, UPSERT_WORKERS)
+    session = build_write_session(workers)
+    batcher = AdaptiveBatcher(initial_rows=BATCH_SIZE, label="model_snapshots")
+    batch_numbers = itertools.count(1)
+
+    def send(batch):
+        print(f"  batch {next(batch_numbers)} ({len(batch)} rows)...")
+        batcher.send(batch, lambda rows: upsert_batch(rows, session))
+
+    # One group at a time: LLM and media rows have different key sets, and
+    # PostgREST rejects a bulk insert whose objects do not share the same keys.
+    for group_name, records in iter_groups():
+        print(f"Upserting group: {group_name}")
+        run_batches(batcher.split(tagged_rows(group_name, records)), send, workers)
+    total = sum(counts.values())
+    print("Rows per group: " + ", ".join(f"{name}={n}" for name, n in counts.items()))
+
+    if generation:
+        # Every group is in; drop media rows this load did not write.
+        print("Deleting non-LLM rows from older generations...")
+        delete_non_llm_rows(keep_generation=generation)
 
     print(f"Done. {total} rows upserted to model_snapshots.")
+    print(f"Write stats: {batcher.summary()}")
 
 
 if __name__ == "__main__":
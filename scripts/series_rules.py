@@ -1,7 +1,14 @@
 #!/usr/bin/env python3
-"""Shared model-series normalization rules for LLM and multimodal models."""
+"""Shared model-series normalization rules for LLM and multimodal models.
+
+Canonicalization runs the raw AA name through the suffix strip rules and then
+through the stages of a modality's ruleset (see RULESETS). Rule tables are
+compiled on first use of their ruleset and results are memoized, so callers
+that only need LLM names never build the multimodal tables and vice versa.
+"""
 
 import re
+from functools import lru_cache
 from typing import Optional
 
 PROVIDER_PREFIXES = {
@@ -26,272 +33,416 @@ PROVIDER_PREFIXES = {
 }
 
 
+_SPACES_RE = re.compile(r"\s+")
+_DOTTED_VERSION_RE = re.compile(r"\b(\d+(?:\.\d+)+)(?=[a-z]?\b)")
+_N_VERSION_RE = re.compile(r"\b(\d+n)\b")
+_INT_VERSION_RE = re.compile(r"\b(\d+)\b")
+
+
 def _normalize_spaces(text: str) -> str:
-    return re.sub(r"\s+", " ", text).strip()
+    return _SPACES_RE.sub(" ", text).strip()
 
 
 def _extract_version_token(text: str) -> Optional[str]:
     lowered = text.lower()
-    m = re.search(r"\b(\d+(?:\.\d+)+)(?=[a-z]?\b)", lowered)
-    if m:
-        return m.group(1)
-    m = re.search(r"\b(\d+n)\b", lowered)
-    if m:
-        return m.group(1)
-    m = re.search(r"\b(\d+)\b", lowered)
-    if m:
-        return m.group(1)
+    for pattern in (_DOTTED_VERSION_RE, _N_VERSION_RE, _INT_VERSION_RE):
+        m = pattern.search(lowered)
+        if m:
+            return m.group(1)
     return None
 
 
-def _extract_prefixed_version(text: str, prefixes: tuple[str, ...]) -> Optional[str]:
+@lru_cache(maxsize=None)
+def _prefixed_version_re(prefixes: tuple[str, ...]) -> re.Pattern:
     prefix_group = "|".join(re.escape(p.lower()) for p in prefixes)
-    m = re.search(
-        rf"\b({prefix_group})\s*([0-9]+(?:\.[0-9]+)?)(?=[a-z]?\b)",
-        text.lower(),
-    )
+    return re.compile(rf"\b({prefix_group})\s*([0-9]+(?:\.[0-9]+)?)(?=[a-z]?\b)")
+
+
+def _extract_prefixed_version(text: str, prefixes: tuple[str, ...]) -> Optional[str]:
+    m = _prefixed_version_re(prefixes).search(text.lower())
     if not m:
         return None
     return f"{m.group(1).upper()}{m.group(2)}"
 
 
+@lru_cache(maxsize=None)
+def _after_brand_re(brand: str) -> re.Pattern:
+    return re.compile(rf"{re.escape(brand.lower())}\s*[-_ ]*([0-9]+(?:\.[0-9]+)?)")
+
+
+def _extract_version_after_brand(text: str, brand: str) -> Optional[str]:
+    """Version attached to the brand token: qwen3.5 -> 3.5, olmo3.1 -> 3.1."""
+    m = _after_brand_re(brand).search(text.lower())
+    return m.group(1) if m else None
+
+
 def _has_brand(text: str, brands: tuple[str, ...]) -> bool:
     low = text.lower()
     return any(b in low for b in brands)
 
 
-def _canonicalize_by_family(name: str) -> str:
-    low = name.lower()
+# ---------------------------------------------------------------------------
+# Rule tables: ordered (trigger, render) pairs evaluated on the lowercased
+# name. The first trigger that matches and renders a non-None name wins; a
+# render returning None falls through to the next rule. Tables are built by
+# the _build_* functions below on first use of a ruleset.
+# ---------------------------------------------------------------------------
 
-    if "claude" in low:
-        family = None
-        for fam in ("sonnet", "opus", "haiku"):
-            if re.search(rf"\b{fam}\b", low):
-                family = fam.title()
-                break
-        version = re.search(r"\b(\d+(?:\.\d+)?)\b", low)
-        if version:
-            return _normalize_spaces(f"Claude {version.group(1)} {family or ''}")
-        return _normalize_spaces(f"Claude {family or ''}")
-
-    if "deepseek" in low:
-        vr = _extract_prefixed_version(low, ("v", "r"))
-        if vr:
-            return f"DeepSeek {vr}"
-        return "DeepSeek"
-
-    if "gemini" in low:
-        version = _extract_version_token(low)
-        return f"Gemini {version}" if version else "Gemini"
-
-    if "gemma" in low:
-        version = _extract_version_token(low)
-        return f"Gemma {version}" if version else "Gemma"
-
-    if "glm" in low:
-        version = _extract_version_token(low)
-        return f"GLM {version}" if version else "GLM"
-
-    if "gpt" in low:
-        version = _extract_version_token(low)
-        return f"GPT {version}" if version else "GPT"
-
-    if re.search(r"\bo[1-9]\b", low):
-        o_match = re.search(r"\b(o[1-9])\b", low)
-        if o_match:
-            return o_match.group(1).upper()
-
-    if "qwen" in low:
-        version = _extract_version_token(low)
-        return f"Qwen {version}" if version else "Qwen"
-
-    if "kimi" in low:
-        k = _extract_prefixed_version(low, ("k",))
-        if k:
-            return f"Kimi {k}"
-        version = _extract_version_token(low)
-        return f"Kimi {version}" if version else "Kimi"
-
-    if "minimax" in low:
-        version = _extract_version_token(low)
-        return f"MiniMax {version}" if version else "MiniMax"
-
-    if _has_brand(low, ("llama", "meta")):
-        version = _extract_version_token(low)
-        return f"Llama {version}" if version else "Llama"
-
-    if "mistral" in low:
-        version = _extract_version_token(low)
-        return f"Mistral {version}" if version else "Mistral"
-
-    if "grok" in low:
-        version = _extract_version_token(low)
-        return f"Grok {version}" if version else "Grok"
-
-    if _has_brand(low, ("ernie", "baidu")):
-        version = _extract_version_token(low)
-        return f"ERNIE {version}" if version else "ERNIE"
-
-    if _has_brand(low, ("doubao", "seed")):
-        version = _extract_version_token(low)
-        return f"Doubao {version}" if version else "Doubao"
-
-    if _has_brand(low, ("nemotron", "nvidia")):
-        version = _extract_version_token(low)
-        return f"NVIDIA Nemotron {version}" if version else "NVIDIA Nemotron"
-
-    if re.search(r"\btri\b", low):
-        size = re.search(r"\b(\d+(?:\.\d+)?)b\b", low)
-        think = " Think" if re.search(r"\bthink\b", low) else ""
-        if size:
-            return f"Tri {size.group(1)}B{think}"
-        return f"Tri{think}".strip()
+_CLAUDE_FAMILY_RES = tuple((fam.title(), re.compile(rf"\b{fam}\b")) for fam in ("sonnet", "opus", "haiku"))
+_CLAUDE_VERSION_RE = re.compile(r"\b(\d+(?:\.\d+)?)\b")
+_O_SERIES_RE = re.compile(r"\b(o[1-9])\b")
+_TRI_SIZE_RE = re.compile(r"\b(\d+(?:\.\d+)?)b\b")
+_THINK_RE = re.compile(r"\bthink\b")
 
-    return name
 
+def _contains(*brands: str):
+    if len(brands) == 1:
+        brand = brands[0]
+        return lambda low: brand in low
+    return lambda low: _has_brand(low, brands)
 
-def trim_series_tail_noise(name: str) -> str:
-    s = re.sub(r"\s+", " ", name).strip()
 
-    while True:
-        ns = re.sub(r"\s*[\(\[].*?[\)\]]\s*$", "", s).strip()
-        if ns == s:
-            break
-        s = ns
+def _matches(pattern: str):
+    return re.compile(pattern).search
 
-    tail_words = (
-        "max", "turbo", "fast", "standard", "ultra", "preview",
-        "pro", "plus", "lite", "instruct", "flash", "director",
-    )
-    pattern = r"(?:\s+|-)(?:" + "|".join(tail_words) + r")$"
-    while True:
-        ns = re.sub(pattern, "", s, flags=re.IGNORECASE).strip()
-        if ns == s:
-            break
-        s = ns
-
-    return s
 
+def _versioned(label: str, brand: Optional[str] = None):
+    """Render `label <version>`, preferring a version attached to `brand` when given."""
 
-def _canonicalize_multimodal(name: str) -> str:
-    low = name.lower()
+    def render(low: str) -> str:
+        version = (brand and _extract_version_after_brand(low, brand)) or _extract_version_token(low)
+        return f"{label} {version}" if version else label
 
-    if "flux" in low:
-        v = re.search(r"flux\s*\.?\s*([0-9]+(?:\.[0-9]+)?)", low)
-        if v:
-            major = int(float(v.group(1)))
-            if major in (1, 2):
-                return f"Flux {major}"
+    return render
 
-    if re.search(r"\bstep1x\s*edit\b", low):
-        return "Step1X Edit"
 
-    if "inworld tts" in low:
-        m = re.search(r"inworld\s*tts\s*([0-9]+(?:\.[0-9]+)?)", low)
-        if m:
-            return f"Inworld TTS {m.group(1)}"
-        return "Inworld TTS"
+def _prefixed(label: str, prefixes: tuple[str, ...], fallback=None):
+    """Render `label <PREFIX><version>` (K2.5, M2, V3), else `fallback(low)` or `label`."""
 
-    if re.search(r"\bamazon\s+titan\s+g1\b", low):
-        return "Amazon Titan G1"
+    def render(low: str) -> Optional[str]:
+        version = _extract_prefixed_version(low, prefixes)
+        if version:
+            return f"{label} {version}"
+        return fallback(low) if fallback else label
+
+    return render
+
+
+def _const(pattern: str, result: str):
+    return _matches(pattern), lambda low: result
+
+
+def _captured(trigger, pattern: str, render):
+    """Render from the first group of `pattern`; fall through when it does not match."""
+    compiled = re.compile(pattern)
+
+    def apply(low: str) -> Optional[str]:
+        m = compiled.search(low)
+        return render(m.group(1)) if m else None
+
+    return trigger, apply
+
+
+def _render_claude(low: str) -> str:
+    family = next((title for title, pattern in _CLAUDE_FAMILY_RES if pattern.search(low)), None)
+    version = _CLAUDE_VERSION_RE.search(low)
+    if version:
+        return _normalize_spaces(f"Claude {version.group(1)} {family or ''}")
+    return _normalize_spaces(f"Claude {family or ''}")
+
+
+def _render_tri(low: str) -> str:
+    size = _TRI_SIZE_RE.search(low)
+    think = " Think" if _THINK_RE.search(low) else ""
+    if size:
+        return f"Tri {size.group(1)}B{think}"
+    return f"Tri{think}".strip()
+
+
+def _render_mistral(low: str) -> str:
+    if "ministral" in low:
+        brand = "Ministral"
+    elif "magistral" in low:
+        brand = "Magistral"
+    else:
+        brand = "Mistral"
+    return _versioned(brand)(low)
+
+
+def _render_command(low: str) -> str:
+    version = _extract_version_token(low)
+    if version:
+        return f"Command {version}"
+    if "r" in low:
+        return "Command R"
+    if "a" in low:
+        return "Command A"
+    return "Command"
+
+
+# Other LLM brands collapsed by principal version: (display, brand keys).
+_LLM_GENERIC_BRANDS = (
+    ("ERNIE", ("ernie",)),
+    ("Doubao", ("doubao",)),
+    ("EXAONE", ("exaone",)),
+    ("Devstral", ("devstral",)),
+    ("Jamba", ("jamba",)),
+    ("Nova", ("nova",)),
+    ("Phi", ("phi",)),
+    ("LFM", ("lfm",)),
+    ("Solar", ("solar",)),
+    ("Sonar", ("sonar",)),
+    ("Ling", ("ling",)),
+    ("OpenChat", ("openchat",)),
+)
+
+
+def _build_llm_family_rules() -> tuple:
+    """Provider-specific LLM families used for model_series of the llm modality."""
+    return (
+        # Claude: keep major/minor version + family (Sonnet/Opus/Haiku)
+        (_contains("claude"), _render_claude),
+        # DeepSeek: collapse to DeepSeek Vx.y (or Rx when present)
+        (_contains("deepseek"), _prefixed("DeepSeek", ("v", "r"))),
+        (_contains("gemini"), _versioned("Gemini")),
+        (_contains("gemma"), _versioned("Gemma")),
+        (_contains("glm"), _versioned("GLM")),
+        (_contains("gpt"), _versioned("GPT")),
+        (_contains("granite"), _versioned("Granite")),
+        (_contains("qwen"), _versioned("Qwen", "qwen")),
+        # Kimi / MiniMax: keep K / M prefix when available (K2.5, M2)
+        (_contains("kimi"), _prefixed("Kimi", ("k",), _versioned("Kimi"))),
+        (_contains("minimax", "mini max"), _prefixed("MiniMax", ("m",), _versioned("MiniMax"))),
+        (_contains("llama"), _versioned("Llama")),
+        (_contains("grok"), _versioned("Grok")),
+        (_contains("mistral", "ministral", "magistral"), _render_mistral),
+        # OpenAI o-series (o1/o3/o4/o5), collapse mini/pro/preview
+        _captured(_matches(r"\bo[1345]"), r"\bo([1345](?:\.\d+)?)\b", lambda v: f"O{v}"),
+        # K2 family (e.g. K2 V2 / K2 Think V2)
+        (_matches(r"\bk2\b"), _prefixed("K2", ("v",))),
+        *(
+            (_contains(*keys), _versioned(display, keys[0]))
+            for display, keys in _LLM_GENERIC_BRANDS
+        ),
+        (_contains("olmo"), _versioned("OLMo", "olmo")),
+        (_contains("command"), _render_command),
+        (_contains("nemotron", "nvidia"), _versioned("NVIDIA Nemotron")),
+        # Tri family: normalize case variants like "Tri 21B think/Think"
+        (_matches(r"\btri\b"), _render_tri),
+    )
 
-    if re.search(r"\bhunyuanimage\s*3\.0\b", low):
-        return "HunyuanImage 3.0"
 
-    if re.search(r"\bsora\s*2\b", low):
-        return "Sora 2"
+def _build_base_family_rules() -> tuple:
+    """Coarser family collapsing applied before the multimodal rules."""
+    return (
+        (_contains("claude"), _render_claude),
+        (_contains("deepseek"), _prefixed("DeepSeek", ("v", "r"))),
+        (_contains("gemini"), _versioned("Gemini")),
+        (_contains("gemma"), _versioned("Gemma")),
+        (_contains("glm"), _versioned("GLM")),
+        (_contains("gpt"), _versioned("GPT")),
+        (_O_SERIES_RE.search, lambda low: _O_SERIES_RE.search(low).group(1).upper()),
+        (_contains("qwen"), _versioned("Qwen")),
+        (_contains("kimi"), _prefixed("Kimi", ("k",), _versioned("Kimi"))),
+        (_contains("minimax"), _versioned("MiniMax")),
+        (_contains("llama", "meta"), _versioned("Llama")),
+        (_contains("mistral"), _versioned("Mistral")),
+        (_contains("grok"), _versioned("Grok")),
+        (_contains("ernie", "baidu"), _versioned("ERNIE")),
+        (_contains("doubao", "seed"), _versioned("Doubao")),
+        (_contains("nemotron", "nvidia"), _versioned("NVIDIA Nemotron")),
+        (_matches(r"\btri\b"), _render_tri),
+    )
 
-    if re.search(r"\breve\s*v?1\b", low):
-        return "Reve V1"
 
-    if "hailuo" in low:
-        if re.search(r"\b2\.3\b", low):
-            return "Hailuo 2.3"
-        if re.search(r"\b0?2\b", low):
-            return "Hailuo 02"
+_FLUX_RE = re.compile(r"flux\s*\.?\s*([0-9]+(?:\.[0-9]+)?)")
+_INWORLD_RE = re.compile(r"inworld\s*tts\s*([0-9]+(?:\.[0-9]+)?)")
+_HAILUO_23_RE = re.compile(r"\b2\.3\b")
+_HAILUO_02_RE = re.compile(r"\b0?2\b")
+_KLING_RE = re.compile(r"\bkling\s*([0-9]+(?:\.[0-9]+)?)\b")
 
-    if "runway gen 3 alpha" in low:
-        return "Runway Gen 3 Alpha"
 
-    if re.search(r"\bveo\b", low):
-        m = re.search(r"\bveo\s*([0-9]+(?:\.[0-9]+)?)", low)
-        if m:
-            return f"Veo {m.group(1)}"
+def _render_flux(low: str) -> Optional[str]:
+    v = _FLUX_RE.search(low)
+    if v:
+        major = int(float(v.group(1)))
+        if major in (1, 2):
+            return f"Flux {major}"
+    return None
 
-    if re.search(r"\bvidu\s*q[0-9]+\b", low):
-        m = re.search(r"\b(vidu\s*q[0-9]+)\b", low)
-        if m:
-            return _normalize_spaces(m.group(1).title())
 
-    if re.search(r"\bimagen\s*4\b", low):
-        return "Imagen 4"
+def _render_inworld(low: str) -> str:
+    m = _INWORLD_RE.search(low)
+    return f"Inworld TTS {m.group(1)}" if m else "Inworld TTS"
 
-    if re.search(r"\bideogram\s*v?2", low):
-        return "Ideogram v2"
 
-    if re.search(r"\blucid\s+origin\b", low):
-        return "Lucid Origin"
+def _render_hailuo(low: str) -> Optional[str]:
+    if _HAILUO_23_RE.search(low):
+        return "Hailuo 2.3"
+    if _HAILUO_02_RE.search(low):
+        return "Hailuo 02"
+    return None
 
-    if re.search(r"\bluma\s+photon\b", low):
-        return "Luma Photon"
 
-    if re.search(r"\bstable\s+diffusion\b", low):
-        m = re.search(r"\bstable\s+diffusion\s+([0-9]+(?:\.[0-9]+)?)\b", low)
-        if m:
-            return f"Stable Diffusion {m.group(1)}"
+def _render_kling(low: str) -> str:
+    m = _KLING_RE.search(low)
+    return f"Kling {m.group(1)}" if m else "Kling"
+
+
+def _build_multimodal_rules() -> tuple:
+    return (
+        (_contains("flux"), _render_flux),
+        _const(r"\bstep1x\s*edit\b", "Step1X Edit"),
+        (_contains("inworld tts"), _render_inworld),
+        _const(r"\bamazon\s+titan\s+g1\b", "Amazon Titan G1"),
+        _const(r"\bhunyuanimage\s*3\.0\b", "HunyuanImage 3.0"),
+        _const(r"\bsora\s*2\b", "Sora 2"),
+        _const(r"\breve\s*v?1\b", "Reve V1"),
+        (_contains("hailuo"), _render_hailuo),
+        (_contains("runway gen 3 alpha"), lambda low: "Runway Gen 3 Alpha"),
+        _captured(_matches(r"\bveo\b"), r"\bveo\s*([0-9]+(?:\.[0-9]+)?)", lambda v: f"Veo {v}"),
+        _captured(
+            _matches(r"\bvidu\s*q[0-9]+\b"),
+            r"\b(vidu\s*q[0-9]+)\b",
+            lambda v: _normalize_spaces(v.title()),
+        ),
+        _const(r"\bimagen\s*4\b", "Imagen 4"),
+        _const(r"\bideogram\s*v?2", "Ideogram v2"),
+        _const(r"\blucid\s+origin\b", "Lucid Origin"),
+        _const(r"\bluma\s+photon\b", "Luma Photon"),
+        _captured(
+            _matches(r"\bstable\s+diffusion\b"),
+            r"\bstable\s+diffusion\s+([0-9]+(?:\.[0-9]+)?)\b",
+            lambda v: f"Stable Diffusion {v}",
+        ),
+        # Kling family: collapse resolution/omni/tier suffixes to version-level series.
+        (_matches(r"\bkling\b"), _render_kling),
+    )
 
-    # Kling family: collapse resolution/omni/tier suffixes to version-level series.
-    if re.search(r"\bkling\b", low):
-        m = re.search(r"\bkling\s*([0-9]+(?:\.[0-9]+)?)\b", low)
-        if m:
-            return f"Kling {m.group(1)}"
-        return "Kling"
 
+def _apply_rules(name: str, rules) -> str:
+    low = name.lower()
+    for trigger, render in rules:
+        if trigger(low):
+            result = render(low)
+            if result is not None:
+                return result
     return name
 
 
-def extract_series_name(aa_name: str, modality: Optional[str] = None) -> str:
-    """Strip suffixes and collapse variants into canonical series families."""
-    name = aa_name
+_TRAILING_BRACKET_RE = re.compile(r"\s*[\(\[].*?[\)\]]\s*$")
+_TAIL_WORDS = (
+    "max", "turbo", "fast", "standard", "ultra", "preview",
+    "pro", "plus", "lite", "instruct", "flash", "director",
+)
+_TAIL_WORD_RE = re.compile(r"(?:\s+|-)(?:" + "|".join(_TAIL_WORDS) + r")$", re.IGNORECASE)
+
+
+def _strip_repeatedly(s: str, pattern: re.Pattern) -> str:
+    while True:
+        ns = pattern.sub("", s).strip()
+        if ns == s:
+            return s
+        s = ns
+
+
+def trim_series_tail_noise(name: str) -> str:
+    s = _normalize_spaces(name)
+    s = _strip_repeatedly(s, _TRAILING_BRACKET_RE)
+    return _strip_repeatedly(s, _TAIL_WORD_RE)
+
 
-    name = re.sub(
+# Suffix/variant stripping applied to the raw AA name, in order, for every modality.
+_STRIP_RULES = (
+    # Reasoning/effort modes
+    (
         r"\s*\((Non-reasoning|Reasoning|Adaptive Reasoning|"
         r"high|low|medium|minimal|xhigh|ChatGPT|experimental|preview|"
         r"high effort|low effort)\)",
         "",
-        name,
-        flags=re.IGNORECASE,
-    )
-    name = re.sub(r"\s*\([A-Za-z]{3,9}\s*'?\s*\d{2}\)", "", name)
-    name = re.sub(r"\s*\(\d{4}\)", "", name)
-    name = re.sub(r"\s+\d+(\.\d+)?[Bb]\s+[Aa]\d+(\.\d+)?[Bb]", "", name)
-    name = re.sub(r"\s+[Aa]\d+(\.\d+)?[Bb]", "", name)
-    name = re.sub(r"\s+\d+(\.\d+)?[Bb]", "", name)
-    name = re.sub(
-        r"\s+(Instruct|Preview|Experimental|Thinking|Exp|Speciale)\s*$",
-        "",
-        name,
-        flags=re.IGNORECASE,
-    )
-    name = re.sub(r"\s+\d{4}\s*$", "", name)
-    name = re.sub(r"\s*-\s*", " ", name)
-    name = _normalize_spaces(name)
+        re.IGNORECASE,
+    ),
+    # Date stamps in parens: (Feb '25), (Mar' 25), (1210)
+    (r"\s*\([A-Za-z]{3,9}\s*'?\s*\d{2}\)", "", 0),
+    (r"\s*\(\d{4}\)", "", 0),
+    # Model size params: "235B A22B", "A3B", "8B", "1.7B"
+    (r"\s+\d+(\.\d+)?[Bb]\s+[Aa]\d+(\.\d+)?[Bb]", "", 0),
+    (r"\s+[Aa]\d+(\.\d+)?[Bb]", "", 0),
+    (r"\s+\d+(\.\d+)?[Bb]", "", 0),
+    # Trailing qualifier words and 4-digit date codes (0905, 2507)
+    (r"\s+(Instruct|Preview|Experimental|Thinking|Exp|Speciale)\s*$", "", re.IGNORECASE),
+    (r"\s+\d{4}\s*$", "", 0),
+    # Punctuation before family collapsing
+    (r"\s*-\s*", " ", 0),
+)
+
+# Ruleset name -> ordered stages applied after suffix stripping. A stage is a
+# rule-table builder (see above) or a plain str -> str function.
+RULESETS = {
+    "llm": (_build_llm_family_rules,),
+    "multimodal": (_build_base_family_rules, _build_multimodal_rules, trim_series_tail_noise),
+}
+_TABLE_BUILDERS = {_build_llm_family_rules, _build_base_family_rules, _build_multimodal_rules}
+
+
+def ruleset_for(modality: Optional[str]) -> str:
+    return "llm" if (modality or "llm") == "llm" else "multimodal"
+
+
+@lru_cache(maxsize=None)
+def _compiled_strip_rules() -> tuple:
+    return tuple((re.compile(pattern, flags), repl) for pattern, repl, flags in _STRIP_RULES)
+
+
+@lru_cache(maxsize=None)
+def _compiled_ruleset(ruleset: str) -> tuple:
+    stages = []
+    for stage in RULESETS[ruleset]:
+        if stage in _TABLE_BUILDERS:
+            rules = stage()
+            stages.append(lambda name, rules=rules: _apply_rules(name, rules))
+        else:
+            stages.append(stage)
+    return tuple(stages)
+
+
+def _strip_suffixes(aa_name: str) -> str:
+    name = aa_name
+    for pattern, repl in _compiled_strip_rules():
+        name = pattern.sub(repl, name)
+    return _normalize_spaces(name)
+
+
+@lru_cache(maxsize=65536)
+def _extract_series_name(aa_name: str, ruleset: str) -> str:
+    name = _strip_suffixes(aa_name)
+    for stage in _compiled_ruleset(ruleset):
+        name = stage(name)
+    return name
+
+
+def extract_series_name(aa_name: str, modality: Optional[str] = None) -> str:
+    """Strip suffixes and collapse variants into canonical series families.
+
+    `modality` selects the ruleset: None/"llm" uses the LLM families, any
+    other modality the multimodal rules. Results are memoized per
+    (aa_name, ruleset).
+    """
+    return _extract_series_name(aa_name, ruleset_for(modality))
+
 
-    canonical = _canonicalize_by_family(name)
-    if (modality or "llm") != "llm":
-        canonical = _canonicalize_multimodal(canonical)
-        canonical = trim_series_tail_noise(canonical)
-    return canonical
+_SLUG_RE = re.compile(r"[^a-z0-9.]+")
+_NON_ALNUM_RE = re.compile(r"[^a-z0-9]")
 
 
 def make_slug(name: str) -> str:
     slug = name.lower()
-    slug = re.sub(r"[^a-z0-9.]+", "-", slug)
+    slug = _SLUG_RE.sub("-", slug)
     return slug.strip("-")
 
 
 def normalize_for_match(name: str) -> str:
-    return re.sub(r"[^a-z0-9]", "", name.lower())
+    return _NON_ALNUM_RE.sub("", name.lower())
 
 
 def infer_provider(series_name: str) -> Optional[str]:
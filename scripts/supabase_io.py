@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""Shared Supabase (PostgREST) write helpers for the data scripts.
+
+AdaptiveBatcher sizes write batches by serialized JSON bytes instead of a
+fixed row count, grows them while requests stay fast and halves them when
+PostgREST answers 413 or the request times out.
+
+QueueUploader batches rows put from a producing thread and uploads them on
+its own thread through a bounded queue, so parsing and uploading overlap.
+
+stream_rows reads a table page by page in primary-key order (keyset
+pagination), optionally fetching the next page while the caller consumes the
+current one.
+
+bulk_set_snapshot_series assigns model_snapshots.series_id for many rows per
+request through the RPC of the same name, falling back to one PATCH per row
+when the RPC is not deployed.
+"""
+
+import json
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+
+import requests
+
+DEFAULT_MAX_BYTES = 512 * 1024
+DEFAULT_MAX_ROWS = 1000
+DEFAULT_TARGET_SECONDS = 2.0
+MIN_BYTES = 16 * 1024
+# Two brackets of the JSON array plus one comma per row.
+_ARRAY_OVERHEAD = 2
+
+
+def payload_size(row) -> int:
+    return len(json.dumps(row, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")) + 1
+
+
+def summarize_latencies(latencies) -> str:
+    if not latencies:
+        return "n/a"
+    ordered = sorted(latencies)
+
+    def pct(q):
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    return f"p50={pct(0.50):.2f}s p95={pct(0.95):.2f}s max={ordered[-1]:.2f}s"
+
+
+class AdaptiveBatcher:
+    """Byte-budgeted batch sizing with latency feedback.
+
+    `split()` reads the current limits each time it starts a batch, so
+    feedback from `send()` applies to the batches that follow, including when
+    several batches are in flight on worker threads.
+    """
+
+    def __init__(
+        self,
+        initial_rows: int = 50,
+        min_rows: int = 1,
+        max_rows: int = DEFAULT_MAX_ROWS,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        target_seconds: float = DEFAULT_TARGET_SECONDS,
+        label: str = "",
+    ):
+        self.min_rows = max(1, min_rows)
+        self.max_rows = max(self.min_rows, max_rows)
+        self.rows = min(self.max_rows, max(self.min_rows, initial_rows))
+        self.max_bytes = max(MIN_BYTES, max_bytes)
+        self.byte_budget = self.max_bytes
+        self.target_seconds = target_seconds
+        self.label = label
+        self.latencies: list[float] = []
+        self.rows_sent = 0
+        self.bytes_sent = 0
+        self.shrinks = 0
+        self._lock = threading.Lock()
+
+    def limits(self) -> tuple[int, int]:
+        with self._lock:
+            return self.rows, self.byte_budget
+
+    def split(self, records):
+        """Yield batches from any iterable (list or generator) under the current limits."""
+        max_rows, max_bytes = self.limits()
+        batch: list = []
+        size = _ARRAY_OVERHEAD
+        for row in records:
+            row_bytes = payload_size(row)
+            if batch and (len(batch) >= max_rows or size + row_bytes > max_bytes):
+                yield batch
+                max_rows, max_bytes = self.limits()
+                batch = []
+                size = _ARRAY_OVERHEAD
+            batch.append(row)
+            size += row_bytes
+        if batch:
+            yield batch
+
+    def observe(self, rows: int, nbytes: int, seconds: float) -> None:
+        """Record a successful request and adapt limits to its latency."""
+        with self._lock:
+            self.latencies.append(seconds)
+            self.rows_sent += rows
+            self.bytes_sent += nbytes
+            if seconds > self.target_seconds:
+                self.rows = max(self.min_rows, self.rows * 3 // 4)
+            elif seconds < self.target_seconds / 2 and rows >= self.rows:
+                self.rows = min(self.max_rows, self.rows + max(1, self.rows // 2))
+                self.byte_budget = min(self.max_bytes, self.byte_budget * 2)
+
+    def shrink(self, rows: int) -> None:
+        """Halve the limits after a 413 or timeout for a batch of `rows` rows."""
+        with self._lock:
+            self.shrinks += 1
+            self.rows = max(self.min_rows, min(self.rows, rows) // 2)
+            self.byte_budget = max(MIN_BYTES, self.byte_budget // 2)
+
+    def send(self, batch: list, post) -> list:
+        """Send `batch` via `post(rows) -> Response`, splitting on 413/timeout.
+
+        `post` is expected to raise on errors it cannot handle itself; 413
+        responses and requests.Timeout are handled here by halving the batch
+        and retrying both halves. Returns the successful responses in order.
+        """
+        responses = []
+        stack = [batch]
+        while stack:
+            part = stack.pop()
+            started = time.perf_counter()
+            try:
+                resp = post(part)
+            except requests.Timeout:
+                if len(part) <= 1:
+                    raise
+                resp = None
+            elapsed = time.perf_counter() - started
+
+            if resp is None or resp.status_code == 413:
+                if len(part) <= 1:
+                    resp.raise_for_status()
+                self.shrink(len(part))
+                mid = len(part) // 2
+                reason = "timeout" if resp is None else "413"
+                print(f"  {self.label or 'batch'}: {reason} on {len(part)} rows; retrying as {mid}+{len(part) - mid}")
+                stack.append(part[mid:])
+                stack.append(part[:mid])
+                continue
+
+            self.observe(len(part), sum(payload_size(row) for row in part), elapsed)
+            responses.append(resp)
+        return responses
+
+    def summary(self) -> str:
+        with self._lock:
+            return (
+                f"{self.rows_sent} rows, {len(self.latencies)} requests, "
+                f"{self.bytes_sent / 1024:.0f} KiB, {self.shrinks} shrinks, "
+                f"latency {summarize_latencies(self.latencies)}"
+            )
+
+
+def run_batches(batches, send_batch, workers: int = 1) -> None:
+    """Call `send_batch(batch)` for each batch with at most `workers` in flight.
+
+    Batches are pulled lazily so an AdaptiveBatcher can resize the ones not
+    yet produced. The first error cancels pending work and is re-raised.
+    """
+    if workers <= 1:
+        for batch in batches:
+            send_batch(batch)
+        return
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch") as pool:
+        pending = set()
+        try:
+            for batch in batches:
+                if len(pending) >= workers:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        future.result()
+                pending.add(pool.submit(send_batch, batch))
+            for future in as_completed(pending):
+                future.result()
+        except BaseException:
+            for future in pending:
+                future.cancel()
+            raise
+
+
+class QueueUploader:
+    """Upload rows on a background thread as they are produced.
+
+    `put()` blocks once `max_queued` rows are waiting, which bounds memory.
+    Rows are batched by an AdaptiveBatcher and sent with `post(rows) ->
+    Response` (see AdaptiveBatcher.send). `close()` flushes the last batch,
+    waits for the thread and re-raises the first upload error.
+    """
+
+    _DONE = object()
+
+    def __init__(self, post, label: str, initial_rows: int = 50, max_queued: int = 2000):
+        self.post = post
+        self.batcher = AdaptiveBatcher(initial_rows=initial_rows, label=label)
+        self.sent = 0
+        self.error: BaseException | None = None
+        self._done_seen = False
+        self._queue: queue.Queue = queue.Queue(maxsize=max(1, max_queued))
+        self._thread = threading.Thread(target=self._run, name=f"upload-{label}", daemon=True)
+        self._thread.start()
+
+    def _rows(self):
+        while True:
+            row = self._queue.get()
+            if row is self._DONE:
+                self._done_seen = True
+                return
+            yield row
+
+    def _run(self) -> None:
+        try:
+            for batch in self.batcher.split(self._rows()):
+                self.batcher.send(batch, self.post)
+                self.sent += len(batch)
+        except BaseException as e:
+            self.error = e
+            # Keep draining so producers blocked in put() can finish, unless
+            # close() has already queued the sentinel (the last batch failed).
+            if not self._done_seen:
+                for _ in iter(self._queue.get, self._DONE):
+                    pass
+
+    def put(self, row) -> None:
+        if self.error is not None:
+            raise self.error
+        self._queue.put(row)
+
+    def close(self) -> int:
+        """Flush, wait for the uploads and return the number of rows sent."""
+        self._queue.put(self._DONE)
+        self._thread.join()
+        if self.error is not None:
+            raise self.error
+        return self.sent
+
+
+def stream_rows(
+    base_url: str,
+    headers: dict,
+    table: str,
+    select: str,
+    key: str,
+    filters: dict | None = None,
+    page_size: int = 1000,
+    prefetch: bool = True,
+    session: requests.Session | None = None,
+    on_response=None,
+):
+    """Yield every row of `table` ordered by the unique column `key`.
+
+    Pages are requested with `<key>=gt.<last key>` rather than offsets, so the
+    cost per page stays flat and no row is skipped or truncated. With
+    `prefetch` the next page is requested while the current one is consumed.
+    `on_response(resp)` is called for every page response (e.g. metrics).
+    """
+    session = session or requests.Session()
+    if select != "*" and key not in {c.strip() for c in select.split(",")}:
+        select = f"{select},{key}"
+    base_params = {**(filters or {}), "select": select, "order": f"{key}.asc", "limit": str(page_size)}
+    url = f"{base_url}/rest/v1/{table}"
+
+    def fetch(after) -> list[dict]:
+        params = dict(base_params)
+        if after is not None:
+            params[key] = f"gt.{after}"
+        resp = session.get(url, headers=headers, params=params, timeout=60)
+        if on_response is not None:
+            on_response(resp)
+        resp.raise_for_status()
+        return resp.json()
+
+    if not prefetch:
+        after = None
+        while True:
+            page = fetch(after)
+            yield from page
+            if len(page) < page_size:
+                return
+            after = page[-1][key]
+
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"stream-{table}") as pool:
+        pending = pool.submit(fetch, None)
+        while pending is not None:
+            page = pending.result()
+            pending = pool.submit(fetch, page[-1][key]) if len(page) >= page_size else None
+            yield from page
+
+
+SERIES_RPC = "bulk_set_snapshot_series"
+
+
+def rpc_missing(resp: requests.Response) -> bool:
+    # PostgREST answers 404 with PGRST202 when the function is not in its schema cache.
+    return resp.status_code == 404 and "PGRST202" in resp.text
+
+
+def bulk_set_snapshot_series(
+    base_url: str,
+    headers: dict,
+    updates: list[tuple[str, str]],
+    progress_every: int = 0,
+    initial_rows: int = 500,
+) -> int:
+    """Set model_snapshots.series_id for each (aa_slug, series_id) pair.
+
+    Returns the number of rows whose series_id changed (per-row fallback:
+    the number of PATCHes sent). Prints progress every `progress_every` rows.
+    """
+    if not updates:
+        return 0
+
+    session = requests.Session()
+    session.headers.update(headers)
+    total = len(updates)
+    done = 0
+    affected = 0
+
+    def report(count: int) -> None:
+        nonlocal done
+        before = done
+        done += count
+        if progress_every > 0 and done // progress_every > before // progress_every:
+            print(f"Progress: updated {done}/{total}")
+
+    def post(batch: list[dict]) -> requests.Response:
+        resp = session.post(f"{base_url}/rest/v1/rpc/{SERIES_RPC}", json={"p_updates": batch}, timeout=60)
+        if not resp.ok and resp.status_code != 413 and not rpc_missing(resp):
+            print(f"  ERROR {resp.status_code}: {resp.text[:400]}", file=sys.stderr)
+            resp.raise_for_status()
+        return resp
+
+    rows = [{"aa_slug": aa_slug, "series_id": series_id} for aa_slug, series_id in updates]
+    batcher = AdaptiveBatcher(initial_rows=initial_rows, max_rows=5000, label="series_id")
+    batches = batcher.split(rows)
+    for batch in batches:
+        responses = batcher.send(batch, post)
+        if responses and rpc_missing(responses[0]):
+            print(f"  RPC {SERIES_RPC} not found; falling back to one PATCH per row.")
+            remaining = list(batch)
+            for rest in batches:
+                remaining.extend(rest)
+            return affected + _patch_each(session, base_url, remaining, report)
+        affected += sum(int(resp.json() or 0) for resp in responses)
+        report(len(batch))
+
+    print(f"  series_id write stats: {batcher.summary()}")
+    return affected
+
+
+def _patch_each(session: requests.Session, base_url: str, rows: list[dict], report) -> int:
+    for row in rows:
+        resp = session.patch(
+            f"{base_url}/rest/v1/model_snapshots",
+            headers={"Prefer": "return=minimal"},
+            params={"aa_slug": f"eq.{row['aa_slug']}"},
+            json={"series_id": row["series_id"]},
+            timeout=60,
+        )
+        resp.raise_for_status()
+        report(1)
+    return len(rows)
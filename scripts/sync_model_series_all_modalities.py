@@ -23,15 +23,12 @@ from pathlib import Path
 
 import requests
 
-from import_social_comments import (
-    extract_series_name as llm_extract_series_name,
-    get_provider as llm_get_provider,
-    make_slug as llm_make_slug,
-)
-from series_rules import extract_series_name as multimodal_extract_series_name
+from series_rules import extract_series_name, infer_provider, make_slug
+from supabase_io import AdaptiveBatcher, bulk_set_snapshot_series, stream_rows
 
 SUPABASE_URL = os.environ.get("SUPABASE_URL", "").rstrip("/")
 SERVICE_ROLE_KEY = os.environ.get("SUPABASE_SERVICE_ROLE_KEY", "")
+# Initial rows per write batch; AdaptiveBatcher resizes from payload bytes and latency.
 BATCH_SIZE = 100
 AUDIT_CSV = Path("Comment/model_series_mapping_sync_audit.csv")
 
@@ -53,33 +50,23 @@ def require_env() -> None:
         sys.exit(1)
 
 
-def load_snapshots() -> list[dict]:
-    resp = requests.get(
-        f"{SUPABASE_URL}/rest/v1/model_snapshots",
-        headers=api_headers(),
-        params={
-            "select": "aa_slug,aa_name,aa_modality,series_id,aa_model_creator_name",
-            "limit": "10000",
-        },
-        timeout=60,
+def load_snapshots():
+    """Stream model_snapshots in aa_slug order."""
+    return stream_rows(
+        SUPABASE_URL,
+        api_headers(),
+        "model_snapshots",
+        "aa_slug,aa_name,aa_modality,series_id,aa_model_creator_name",
+        key="aa_slug",
     )
-    resp.raise_for_status()
-    return resp.json()
 
 
 def load_series() -> list[dict]:
-    resp = requests.get(
-        f"{SUPABASE_URL}/rest/v1/model_series",
-        headers=api_headers(),
-        params={"select": "id,slug,display_name,provider", "limit": "10000"},
-        timeout=60,
-    )
-    resp.raise_for_status()
-    return resp.json()
+    return list(stream_rows(SUPABASE_URL, api_headers(), "model_series", "id,slug,display_name,provider", key="id"))
 
 
 def build_series_slug(modality: str, series_name: str) -> str:
-    base = llm_make_slug(series_name)
+    base = make_slug(series_name)
     # Keep LLM legacy slug format unchanged; split non-LLM by modality.
     if (modality or "llm") == "llm":
         return base
@@ -89,32 +76,27 @@ def build_series_slug(modality: str, series_name: str) -> str:
 def upsert_series(records: list[dict]) -> None:
     if not records:
         return
-    for i in range(0, len(records), BATCH_SIZE):
-        batch = records[i : i + BATCH_SIZE]
+
+    def post(batch: list[dict]) -> requests.Response:
         resp = requests.post(
             f"{SUPABASE_URL}/rest/v1/model_series",
             headers=api_headers("resolution=ignore-duplicates,return=minimal"),
             json=batch,
             timeout=60,
         )
-        resp.raise_for_status()
+        if resp.status_code != 413:
+            resp.raise_for_status()
+        return resp
+
+    batcher = AdaptiveBatcher(initial_rows=BATCH_SIZE, label="model_series")
+    for batch in batcher.split(records):
+        batcher.send(batch, post)
 
 
 def slug_exists(slug: str, slug_to_series: dict[str, dict]) -> bool:
     return slug in slug_to_series
 
 
-def patch_snapshot_series(aa_slug: str, series_id: str) -> None:
-    resp = requests.patch(
-        f"{SUPABASE_URL}/rest/v1/model_snapshots",
-        headers=api_headers("return=minimal"),
-        params={"aa_slug": f"eq.{aa_slug}"},
-        json={"series_id": series_id},
-        timeout=60,
-    )
-    resp.raise_for_status()
-
-
 def write_audit(rows: list[dict]) -> None:
     AUDIT_CSV.parent.mkdir(parents=True, exist_ok=True)
     with AUDIT_CSV.open("w", encoding="utf-8", newline="") as f:
@@ -158,25 +140,21 @@ def main() -> None:
     args = parse_args()
     require_env()
 
-    snapshots = load_snapshots()
-    print(f"Loaded snapshots: {len(snapshots)}")
-
     existing_series = load_series()
     slug_to_series = {row["slug"]: row for row in existing_series}
     print(f"Loaded model_series: {len(existing_series)}")
 
-    # Build expected mapping and series candidates.
+    # Build expected mapping and series candidates while snapshots stream in.
     audit_rows: list[dict] = []
     missing_series_records: dict[str, dict] = {}
-    for snap in snapshots:
+    loaded_snapshots = 0
+    for snap in load_snapshots():
+        loaded_snapshots += 1
         modality = (snap.get("aa_modality") or "llm").strip()
         aa_name = snap.get("aa_name") or ""
         aa_slug = snap.get("aa_slug") or ""
         current_series_id = snap.get("series_id")
-        if modality == "llm":
-            series_name = llm_extract_series_name(aa_name)
-        else:
-            series_name = multimodal_extract_series_name(aa_name, modality)
+        series_name = extract_series_name(aa_name, modality)
         if not series_name:
             continue
 
@@ -199,10 +177,12 @@ def main() -> None:
             missing_series_records[series_slug] = {
                 "slug": series_slug,
                 "display_name": series_name,
-                "provider": llm_get_provider(series_name),
+                "provider": infer_provider(series_name),
                 "query_aliases": [],
             }
 
+    print(f"Loaded snapshots: {loaded_snapshots}")
+
     upsert_records = list(missing_series_records.values())
     if args.dry_run:
         print(f"Dry-run: would upsert new series rows: {len(upsert_records)}")
@@ -237,11 +217,15 @@ def main() -> None:
     if args.dry_run:
         print(f"Dry-run: rows requiring series_id update: {total_updates}")
     else:
-        for idx, (aa_slug, target_series_id, modality) in enumerate(updates_to_apply, start=1):
-            patch_snapshot_series(aa_slug, target_series_id)
+        changed = bulk_set_snapshot_series(
+            SUPABASE_URL,
+            api_headers(),
+            [(aa_slug, target_series_id) for aa_slug, target_series_id, _ in updates_to_apply],
+            progress_every=args.progress_every,
+        )
+        for _, _, modality in updates_to_apply:
             per_modality[modality] += 1
-            if args.progress_every > 0 and idx % args.progress_every == 0:
-                print(f"Progress: patched {idx}/{total_updates}")
+        print(f"Rows changed by bulk update: {changed}")
 
     write_audit(sorted(audit_rows, key=lambda r: (r["modality"], r["series_name"].lower(), r["aa_name"].lower())))
     if args.dry_run:
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""Tests for supabase_io.QueueUploader error handling.
+
+Run:
+    python -m unittest discover -s scripts -p "test_*.py"
+"""
+
+import threading
+import unittest
+
+import requests
+
+from supabase_io import QueueUploader
+
+
+class _Response:
+    status_code = 201
+    ok = True
+
+
+def _close_within(uploader: QueueUploader, seconds: float = 5.0):
+    """Call close() on a helper thread; return (finished, error raised by close)."""
+    outcome = {}
+
+    def run():
+        try:
+            outcome["sent"] = uploader.close()
+        except BaseException as e:  # noqa: BLE001 - the test inspects it
+            outcome["error"] = e
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(seconds)
+    return not thread.is_alive(), outcome.get("error")
+
+
+class QueueUploaderTest(unittest.TestCase):
+    def test_close_returns_rows_sent(self):
+        uploader = QueueUploader(lambda rows: _Response(), "ok", initial_rows=2)
+        for i in range(5):
+            uploader.put({"i": i})
+        finished, error = _close_within(uploader)
+        self.assertTrue(finished)
+        self.assertIsNone(error)
+        self.assertEqual(uploader.sent, 5)
+
+    def test_failure_on_final_batch_raises_from_close(self):
+        def post(rows):
+            raise requests.HTTPError("final batch rejected")
+
+        uploader = QueueUploader(post, "final", initial_rows=50)
+        for i in range(3):
+            uploader.put({"i": i})
+        finished, error = _close_within(uploader)
+        self.assertTrue(finished, "close() hung after the final batch failed")
+        self.assertIsInstance(error, requests.HTTPError)
+
+    def test_failure_mid_stream_raises_from_put_and_close(self):
+        def post(rows):
+            raise requests.HTTPError("first batch rejected")
+
+        uploader = QueueUploader(post, "mid", initial_rows=1, max_queued=1)
+        with self.assertRaises(requests.HTTPError):
+            for i in range(1000):
+                uploader.put({"i": i})
+        finished, error = _close_within(uploader)
+        self.assertTrue(finished)
+        self.assertIsInstance(error, requests.HTTPError)
+
+
+if __name__ == "__main__":
+    unittest.main()
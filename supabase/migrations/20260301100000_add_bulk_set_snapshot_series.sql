@@ -0,0 +1,25 @@
+-- Bulk series_id assignment for model_snapshots.
+-- Takes a JSON array of {"aa_slug": ..., "series_id": ...} and returns the
+-- number of rows whose series_id actually changed.
+
+CREATE OR REPLACE FUNCTION public.bulk_set_snapshot_series(p_updates jsonb)
+RETURNS integer
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  v_rows integer := 0;
+BEGIN
+  UPDATE public.model_snapshots s
+  SET series_id = u.series_id
+  FROM jsonb_to_recordset(COALESCE(p_updates, '[]'::jsonb)) AS u(aa_slug text, series_id uuid)
+  WHERE s.aa_slug = u.aa_slug
+    AND s.series_id IS DISTINCT FROM u.series_id;
+
+  GET DIAGNOSTICS v_rows = ROW_COUNT;
+  RETURN v_rows;
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION public.bulk_set_snapshot_series(jsonb) TO service_role;
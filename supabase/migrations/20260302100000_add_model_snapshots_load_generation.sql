@@ -0,0 +1,7 @@
+-- Generation marker for scripts/seed_from_csv.py.
+-- Each seed run upserts its rows tagged with a new generation and then deletes
+-- the non-LLM rows of older generations in one statement, so readers never see
+-- an empty media catalog while the load is in progress.
+
+ALTER TABLE public.model_snapshots
+  ADD COLUMN IF NOT EXISTS load_generation text;
@@ -0,0 +1,35 @@
+-- Bulk insert for social_posts that reports what it did.
+-- Takes a JSON array of social_posts rows (without id/created_at), inserts
+-- them with ON CONFLICT (uid) DO NOTHING and returns only the counts:
+-- {"inserted": <new rows>, "skipped": <rows whose uid already existed>}.
+
+CREATE OR REPLACE FUNCTION public.insert_social_posts(p_rows jsonb)
+RETURNS jsonb
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  v_total integer := jsonb_array_length(COALESCE(p_rows, '[]'::jsonb));
+  v_inserted integer := 0;
+BEGIN
+  INSERT INTO public.social_posts (
+    uid, series_id, platform, query, post_date, source_url, title, author,
+    like_count, comment_count, collect_count,
+    overall_score, score_quality, score_value, score_latency, score_throughput, score_stability,
+    pros_summary, cons_summary, overall_summary, evidence, tag, fetched_at, run_id
+  )
+  SELECT
+    r.uid, r.series_id, r.platform, r.query, r.post_date, r.source_url, r.title, r.author,
+    COALESCE(r.like_count, 0), COALESCE(r.comment_count, 0), COALESCE(r.collect_count, 0),
+    r.overall_score, r.score_quality, r.score_value, r.score_latency, r.score_throughput, r.score_stability,
+    r.pros_summary, r.cons_summary, r.overall_summary, r.evidence, r.tag, r.fetched_at, r.run_id
+  FROM jsonb_populate_recordset(NULL::public.social_posts, COALESCE(p_rows, '[]'::jsonb)) AS r
+  ON CONFLICT (uid) DO NOTHING;
+
+  GET DIAGNOSTICS v_inserted = ROW_COUNT;
+  RETURN jsonb_build_object('inserted', v_inserted, 'skipped', v_total - v_inserted);
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION public.insert_social_posts(jsonb) TO service_role;